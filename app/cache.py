@@ -0,0 +1,42 @@
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+class PageCache:
+    """Short-lived in-process cache of rendered HTML, invalidated explicitly on writes"""
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, bytes]] = {}
+        self._generations: Dict[Hashable, int] = {}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, body = entry
+        if expires < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return body
+
+    def generation(self, key: Hashable) -> int:
+        """Take before reading the data a page is rendered from; pass the result to set()"""
+        return self._generations.get(key, 0)
+
+    def set(self, key: Hashable, body: bytes, generation: int):
+        # An invalidate() while the page was rendering means the body may be stale
+        if self._generations.get(key, 0) != generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+
+    def invalidate(self, *keys: Hashable):
+        for key in keys:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self._generations.clear()
+
+# Doctor dashboards keyed by doctor id. Single worker, so in-process invalidation is
+# enough; patient/admin dashboards are never cached because each view is audited.
+doctor_dashboards = PageCache(ttl=15)
@@ -1,29 +1,38 @@
 import os
 import secrets
+from functools import lru_cache
+from pathlib import Path
 from cryptography.fernet import Fernet
 
 class Settings:
     def __init__(self):
-        self.SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_hex(32))
+        self.SECRET_KEY: str = os.getenv("SECRET_KEY") or secrets.token_hex(32)
         self.ALGORITHM: str = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
-        
+
         # Priority: Env Var > Local File > Default SQLite
         self.DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./clinicvault.db")
-        
+
         # Priority: Env Var > Local File > Generate New
         env_key = os.getenv("ENCRYPTION_KEY")
         if env_key:
             self.ENCRYPTION_KEY = env_key.encode()
         else:
             # Fallback for local testing only
-            encryption_key_file = ".encryption_key"
-            if os.path.exists(encryption_key_file):
-                with open(encryption_key_file, 'rb') as f:
-                    self.ENCRYPTION_KEY = f.read()
-            else:
+            encryption_key_file = Path(".encryption_key")
+            try:
+                self.ENCRYPTION_KEY = encryption_key_file.read_bytes()
+            except FileNotFoundError:
                 self.ENCRYPTION_KEY = Fernet.generate_key()
-                with open(encryption_key_file, 'wb') as f:
-                    f.write(self.ENCRYPTION_KEY)
+                encryption_key_file.write_bytes(self.ENCRYPTION_KEY)
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the process-wide Settings once; later calls return the cached instance"""
+    return Settings()
 
-settings = Settings()
\ No newline at end of file
+def __getattr__(name: str):
+    # Keeps `from app.config import settings` working without constructing at import time
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
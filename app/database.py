@@ -1,16 +1,41 @@
+from sqlalchemy import event
 from sqlmodel import SQLModel, Session, create_engine
 from app.config import settings
 
 # Import models to ensure they're registered with SQLModel
-from app.models import User, Consultation, PrivacyLog  # noqa: F401
+from app.models import User, Consultation, PrivacyLog, TranscriptChunk  # noqa: F401
+
+_is_sqlite = settings.DATABASE_URL.startswith("sqlite")
 
 # check_same_thread=False is needed only for SQLite
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    pool_pre_ping=True,
+    query_cache_size=1200  # compiled-SQL cache; default 500 is shared with ORM-generated statements
+)
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers proceed while a writer commits; pooled connections keep the file open"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
 
 def get_db():
+    """Blocking session; routes that use it are plain `def` so FastAPI runs them in its threadpool"""
     with Session(engine) as session:
         yield session
 
 def init_db():
     """Initialize database and create all tables"""
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist; add any indexes declared since
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
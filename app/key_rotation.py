@@ -0,0 +1,57 @@
+"""
+Re-encrypt stored PHI after ENCRYPTION_KEY has been rotated.
+
+    OLD_ENCRYPTION_KEY=<previous key> ENCRYPTION_KEY=<new key> python -m app.key_rotation
+
+Every *_enc column is decrypted with the old key and sealed again under the current
+one in a single transaction. Values the old key cannot open (already rotated, corrupt)
+are left untouched, so an interrupted or repeated run is safe.
+"""
+import logging
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cryptography.fernet import Fernet
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import User, Consultation, TranscriptChunk
+from app.security import derive_aead, encrypt_phi, open_phi
+
+logger = logging.getLogger(__name__)
+
+PHI_COLUMNS = {
+    User: ("phone_enc", "address_enc", "date_of_birth_enc"),
+    Consultation: ("symptoms_enc", "notes_enc", "transcript_enc"),
+    TranscriptChunk: ("text_enc",),
+}
+
+def reencrypt_phi(session: Session, old_key: bytes) -> int:
+    """Re-seal every PHI value readable with old_key under the current key; returns the count"""
+    old_fernet, old_aead = Fernet(old_key), derive_aead(old_key)
+    rotated = 0
+    for model, columns in PHI_COLUMNS.items():
+        for row in session.exec(select(model)):
+            for column in columns:
+                token = getattr(row, column)
+                if not token:
+                    continue
+                try:
+                    plaintext = open_phi(token, old_fernet, old_aead)
+                except Exception:
+                    continue
+                setattr(row, column, encrypt_phi(plaintext))
+                rotated += 1
+            session.add(row)
+    session.commit()
+    return rotated
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    old_key = os.getenv("OLD_ENCRYPTION_KEY")
+    if not old_key:
+        sys.exit("Set OLD_ENCRYPTION_KEY to the key being retired")
+    with Session(engine) as session:
+        logger.info("Re-encrypted %d PHI values", reencrypt_phi(session, old_key.encode()))
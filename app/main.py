@@ -1,49 +1,84 @@
+import asyncio
+import os
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import uvicorn
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
 import traceback
+from html import escape
 
+from app.responses import JSONResponse, wants_json
 from app.database import init_db
+from app.security import crypto_self_check
+from app.transcription import warmup
 from app.routers import auth, admin, workflow
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    crypto_self_check()
+    # Load Whisper off the event loop; an early transcription simply waits on the model lock
+    asyncio.get_running_loop().run_in_executor(None, warmup)
     yield
 
-app = FastAPI(title="ClinicVault Enterprise", lifespan=lifespan)
+app = FastAPI(title="ClinicVault Enterprise", lifespan=lifespan, default_response_class=JSONResponse)
+
+# Static parts of the HTML error pages, built once; only the detail is filled per request
+VALIDATION_ERROR_HTML = "<h3>Validation Error</h3><p>{}</p><a href='/'>Go Back</a>"
+GENERAL_ERROR_HTML = "<h3>An error occurred</h3><p>{}</p><a href='/dashboard'>Go to Dashboard</a>"
+
+def _error_detail(exc: Exception) -> str:
+    try:
+        return str(exc)
+    except Exception:
+        return type(exc).__name__
 
 # Error Handling Middleware
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors"""
-    if request.headers.get("accept") == "application/json":
+    error_detail = _error_detail(exc)
+    if wants_json(request):
         return JSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content={"error": "Validation error", "details": str(exc)}
+            content={"error": "Validation error", "details": error_detail}
         )
     return HTMLResponse(
-        content=f"<h3>Validation Error</h3><p>{str(exc)}</p><a href='/'>Go Back</a>",
+        content=VALIDATION_ERROR_HTML.format(escape(error_detail)),
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
     )
 
+@app.exception_handler(StarletteHTTPException)
+async def auth_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Render 401/403 raised by auth dependencies; defer everything else to FastAPI"""
+    if exc.status_code not in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN):
+        return await http_exception_handler(request, exc)
+    if wants_json(request):
+        return JSONResponse(status_code=exc.status_code, content={"error": exc.detail})
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        return RedirectResponse("/", status_code=303)
+    return HTMLResponse(f"Unauthorized: {exc.detail}", status_code=exc.status_code)
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle general exceptions"""
-    error_detail = str(exc)
-    if request.headers.get("accept") == "application/json":
+    error_detail = _error_detail(exc)
+    if wants_json(request):
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"error": "Internal server error", "detail": error_detail}
         )
     return HTMLResponse(
-        content=f"<h3>An error occurred</h3><p>{error_detail}</p><a href='/dashboard'>Go to Dashboard</a>",
+        content=GENERAL_ERROR_HTML.format(escape(error_detail)),
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
     )
 
@@ -52,5 +87,20 @@ app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(workflow.router)
 
+# Stylesheet and consultation-room script are served (and browser-cached) as files instead of inlined in every page
+app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static")
+
+# Pages, JSON and static text compress ~70-85%; tiny bodies (redirects, errors) are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    # Single worker: WebSocket rooms live in this process's ConnectionManager.
+    # "auto" picks uvloop/httptools when installed (uvicorn[standard]).
+    uvicorn.run(
+        "app.main:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="auto",
+        http="auto",
+        reload=os.getenv("DEV") == "1"
+    )
@@ -1,8 +1,8 @@
 from typing import Optional
 from datetime import datetime
 from enum import Enum
-from sqlmodel import Field, SQLModel, Column, Index
-from sqlalchemy import DateTime
+from sqlmodel import Field, SQLModel, Column, Index, Relationship
+from sqlalchemy import DateTime, func
 
 class UserRole(str, Enum):
     PATIENT = "patient"
@@ -20,14 +20,24 @@ class ConsultationStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+class Specialty(str, Enum):
+    """Specialties offered at triage; the values are what User/Consultation.specialty store"""
+    GENERAL = "General"
+    CARDIOLOGY = "Cardiology"
+    DERMATOLOGY = "Dermatology"
+
+# Timestamps are filled by the database clock (CURRENT_TIMESTAMP, UTC) rather than
+# datetime.utcnow(); the client-side SQL default also covers tables created before
+# the server default existed.
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    email: str = Field(unique=True, index=True, max_length=255)
+    email: str = Field(max_length=255)  # unique via idx_user_login
     hashed_password: str = Field(max_length=255)
     full_name: str = Field(max_length=255, index=True)
     role: UserRole = Field(index=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow))
-    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow))
+    created_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, default=func.now(), server_default=func.now()))
+    updated_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now()))
     
     # Doctor specific fields
     specialty: Optional[str] = Field(default=None, max_length=100, index=True)
@@ -42,6 +52,10 @@ class User(SQLModel, table=True):
     __table_args__ = (
         Index('idx_user_role_status', 'role', 'status'),
         Index('idx_user_specialty_status', 'specialty', 'status'),
+        # Triage lookup: role + specialty + status are all equality filters
+        Index('idx_user_role_specialty_status', 'role', 'specialty', 'status'),
+        # Unique on email; on PostgreSQL the INCLUDE columns let login verify from the index alone
+        Index('idx_user_login', 'email', unique=True, postgresql_include=['hashed_password', 'id']),
     )
 
 class Consultation(SQLModel, table=True):
@@ -50,8 +64,8 @@ class Consultation(SQLModel, table=True):
     doctor_id: int = Field(foreign_key="user.id", index=True)
     specialty: str = Field(max_length=100, index=True)
     status: ConsultationStatus = Field(default=ConsultationStatus.PENDING_PAYMENT, index=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, index=True))
-    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow))
+    created_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, default=func.now(), server_default=func.now(), index=True))
+    updated_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now()))
     started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     ended_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     
@@ -65,6 +79,10 @@ class Consultation(SQLModel, table=True):
     payment_status: Optional[str] = None
     payment_date: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     
+    # Lazy by default; routes that need the users load them with joinedload()
+    doctor: Optional[User] = Relationship(sa_relationship_kwargs={"foreign_keys": "Consultation.doctor_id"})
+    patient: Optional[User] = Relationship(sa_relationship_kwargs={"foreign_keys": "Consultation.patient_id"})
+    
     # Indexes for better query performance
     __table_args__ = (
         Index('idx_consultation_patient_status', 'patient_id', 'status'),
@@ -73,6 +91,18 @@ class Consultation(SQLModel, table=True):
         Index('idx_consultation_patient_created', 'patient_id', 'created_at'),
     )
 
+class TranscriptChunk(SQLModel, table=True):
+    """Append-only live transcript segments, folded into Consultation.transcript_enc when it ends"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    consultation_id: int = Field(foreign_key="consultation.id")
+    user_id: int = Field(foreign_key="user.id")  # speaker, kept for attribution in the folded transcript
+    seq: int  # capture time in epoch milliseconds; orders the chunks
+    text_enc: str
+    
+    __table_args__ = (
+        Index('idx_transcript_consultation_seq', 'consultation_id', 'seq'),
+    )
+
 class PrivacyLog(SQLModel, table=True):
     """Immutable Audit Trail for HIPAA Compliance"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -81,7 +111,7 @@ class PrivacyLog(SQLModel, table=True):
     actor_name: str = Field(max_length=255)
     action: str = Field(max_length=255, index=True)
     target_data: str 
-    timestamp: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, default=datetime.utcnow, index=True))
+    timestamp: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, default=func.now(), server_default=func.now(), index=True))
     purpose: str = Field(max_length=255)
     ip_address: Optional[str] = Field(default=None, max_length=45)
     
@@ -0,0 +1,14 @@
+from typing import Any
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse as _JSONResponse
+
+class JSONResponse(_JSONResponse):
+    """JSONResponse serialized with orjson (Rust) instead of the stdlib json encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+def wants_json(request: Request) -> bool:
+    """Content negotiation, resolved once per request when used as a dependency"""
+    return "application/json" in request.headers.get("accept", "")
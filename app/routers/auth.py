@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import insert
 from sqlmodel import Session, select
 import re
+from functools import lru_cache
 
+from app.responses import JSONResponse, wants_json
 from app.database import get_db
-from app.models import User, UserRole, DoctorStatus
-from app.security import create_access_token, pwd_context, audit_log
+from app.models import User, UserRole, DoctorStatus, Specialty
+from app.security import create_access_token, hash_password, verify_password, password_needs_rehash, queue_audit_log
 from app.templates import render_template
 
 router = APIRouter()
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 @router.get("/", response_class=HTMLResponse)
 async def root():
     return render_template("login", {})
@@ -20,16 +25,19 @@ async def register_page():
     return render_template("register", {})
 
 @router.post("/auth/login")
-async def login(
+def login(
     request: Request,
+    background: BackgroundTasks,
     username: str = Form(...),
     password: str = Form(...),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    is_json: bool = Depends(wants_json)
 ):
-    user = session.exec(select(User).where(User.email == username)).first()
-    if not user or not pwd_context.verify(password, user.hashed_password):
+    # Verify against the covering login index first; the full row is only loaded on success
+    credentials = session.exec(select(User.id, User.hashed_password).where(User.email == username)).first()
+    if not credentials or not verify_password(password, credentials.hashed_password):
         # Return JSON response for AJAX handling
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Incorrect email or password"}
@@ -39,27 +47,32 @@ async def login(
             "error": "Incorrect email or password. Please try again."
         })
     
+    user = session.get(User, credentials.id)
+    if password_needs_rehash(credentials.hashed_password):
+        user.hashed_password = hash_password(password)
+        session.commit()
     access_token = create_access_token(data={"sub": user.email})
-    audit_log(session, user, "User Login", "Authentication System", "Access Control")
+    queue_audit_log(background, session, user, "User Login", "Authentication System", "Access Control")
     
     response = RedirectResponse("/dashboard", status_code=303)
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
     return response
 
 @router.post("/auth/register")
-async def register(
+def register(
     request: Request,
+    background: BackgroundTasks,
     full_name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
     password_confirm: str = Form(None),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    is_json: bool = Depends(wants_json)
 ):
     errors = []
     
     # Validate email format
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
+    if not EMAIL_PATTERN.match(email):
         errors.append("Invalid email format")
     
     # Validate password strength
@@ -71,12 +84,12 @@ async def register(
         errors.append("Passwords do not match")
     
     # Check if email already exists
-    existing = session.exec(select(User).where(User.email == email)).first()
+    existing = session.exec(select(User.id).where(User.email == email)).first()
     if existing:
         errors.append("Email already registered")
     
     if errors:
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(
                 status_code=400,
                 content={"errors": errors}
@@ -89,45 +102,52 @@ async def register(
     
     new_user = User(
         email=email,
-        hashed_password=pwd_context.hash(password),
+        hashed_password=hash_password(password),
         full_name=full_name,
         role=UserRole.PATIENT
     )
     session.add(new_user)
     session.commit()
-    audit_log(session, new_user, "Patient Registration", "User Account", "Onboarding")
+    queue_audit_log(background, session, new_user, "Patient Registration", "User Account", "Onboarding")
     
     return RedirectResponse("/", status_code=303)
 
+@lru_cache(maxsize=None)
+def _demo_password_hash(password: str) -> str:
+    """Hash demo credentials once per process; re-seeding only pays for the INSERTs"""
+    return hash_password(password, rounds=1000)
+
 @router.post("/auth/seed")
-async def seed_demo_data(session: Session = Depends(get_db)):
-    # Seed some demo data
-    admin = User(
-        email="admin@hospital.com",
-        hashed_password=pwd_context.hash("admin123"),
-        full_name="System Administrator",
-        role=UserRole.ADMIN
-    )
-    session.add(admin)
-    
-    doctor = User(
-        email="doctor@hospital.com",
-        hashed_password=pwd_context.hash("doctor123"),
-        full_name="Dr. Smith",
-        role=UserRole.DOCTOR,
-        specialty="General",
-        status=DoctorStatus.ONLINE
-    )
-    session.add(doctor)
-    
-    patient = User(
-        email="patient@hospital.com",
-        hashed_password=pwd_context.hash("patient123"),
-        full_name="John Doe",
-        role=UserRole.PATIENT
-    )
-    session.add(patient)
+def seed_demo_data(session: Session = Depends(get_db)):
+    # Seed some demo data; identical keys per row let the driver run one executemany
+    demo_users = [
+        {
+            "email": "admin@hospital.com",
+            "hashed_password": _demo_password_hash("admin123"),
+            "full_name": "System Administrator",
+            "role": UserRole.ADMIN,
+            "specialty": None,
+            "status": DoctorStatus.OFFLINE
+        },
+        {
+            "email": "doctor@hospital.com",
+            "hashed_password": _demo_password_hash("doctor123"),
+            "full_name": "Dr. Smith",
+            "role": UserRole.DOCTOR,
+            "specialty": Specialty.GENERAL.value,
+            "status": DoctorStatus.ONLINE
+        },
+        {
+            "email": "patient@hospital.com",
+            "hashed_password": _demo_password_hash("patient123"),
+            "full_name": "John Doe",
+            "role": UserRole.PATIENT,
+            "specialty": None,
+            "status": DoctorStatus.OFFLINE
+        },
+    ]
     
+    session.exec(insert(User.__table__), params=demo_users)
     session.commit()
     return RedirectResponse("/", status_code=303)
 
@@ -1,81 +1,156 @@
-import shutil
+import asyncio
+import io
+import logging
+import re
 import os
-import json
-import uuid
-from typing import List, Dict
-from datetime import datetime
-from fastapi import APIRouter, Depends, Form, Request, WebSocket, WebSocketDisconnect, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+import time
+import orjson
+from contextlib import aclosing
+from typing import List, Dict, Optional, Set
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Request, WebSocket, WebSocketDisconnect, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy import bindparam, case, delete, func, literal, update
+from sqlalchemy.orm import aliased, joinedload
 from sqlmodel import Session, select, or_
 
-from app.database import get_db
-from app.models import User, Consultation, ConsultationStatus, DoctorStatus, UserRole, PrivacyLog
-from app.security import get_current_user, get_current_user_from_token, encrypt_phi, decrypt_phi, audit_log
+from app.responses import JSONResponse, wants_json
+from app.cache import doctor_dashboards
+from app.database import engine, get_db
+from app.models import User, Consultation, ConsultationStatus, DoctorStatus, UserRole, PrivacyLog, TranscriptChunk, Specialty
+from app.security import current_user, get_current_user_from_token, encrypt_phi, decrypt_phi, decrypt_phi_cached, decrypt_phi_many, audit_log, queue_audit_log
 from app.templates import render_template
-from app.transcription import transcribe_audio_chunk
+from app.routers.admin import DOCTORS_STMT, LOG_COLUMNS, RECENT_LOGS_STMT
+from app.transcription import aiter_transcript, transcribe_audio_async
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+Doctor = aliased(User, name="doctor")
+Patient = aliased(User, name="patient")
+# Column type for binding DoctorStatus literals the way the ORM stores them
+STATUS_TYPE = User.__table__.c.status.type
+
+# Numbered ("1. ...") or bulleted ("- ...") lines, with the marker stripped
+LIST_ITEM_PATTERN = re.compile(r'^[ \t]*(?=[\d-])(?:\d.*?\. |- )?(.*?)[ \t\r]*$', re.M)
+
+# Leading "type" key of WebRTC signaling frames
+SIGNAL_PATTERN = re.compile(r'\{\s*"type"\s*:\s*"(?:offer|answer|candidate)"')
+SIGNAL_TYPES = frozenset({"offer", "answer", "candidate"})
+
+# Hot-path statements built once with bound parameters so each request only binds values
+OPEN_STATUSES = (ConsultationStatus.ACTIVE, ConsultationStatus.PENDING_PAYMENT)
+DOCTOR_CONSULTS_STMT = select(Consultation.id, Consultation.patient_id, Consultation.status).where(
+    Consultation.doctor_id == bindparam("doctor_id"), Consultation.status.in_(OPEN_STATUSES)
+)
+PATIENT_CONSULT_STMT = select(Consultation.id, Consultation.status, Consultation.specialty).where(
+    Consultation.patient_id == bindparam("patient_id"), Consultation.status.in_(OPEN_STATUSES)
+)
+PATIENT_LOGS_STMT = select(*LOG_COLUMNS).where(
+    or_(PrivacyLog.actor_id == bindparam("actor_id"), PrivacyLog.target_data != "System Internal")
+).order_by(PrivacyLog.timestamp.desc(), PrivacyLog.id.desc()).limit(10)
+ONLINE_DOCTOR_STMT = select(User).where(
+    User.role == UserRole.DOCTOR, User.specialty == bindparam("specialty"), User.status == DoctorStatus.ONLINE
+)
+CONSULT_ACCESS_STMT = select(Consultation.patient_id, Consultation.doctor_id, Consultation.status).where(
+    Consultation.id == bindparam("consult_id")
+)
+TRANSCRIPT_CHUNKS_STMT = select(TranscriptChunk.text_enc, User.full_name).outerjoin(
+    User, User.id == TranscriptChunk.user_id
+).where(
+    TranscriptChunk.consultation_id == bindparam("consult_id")
+).order_by(TranscriptChunk.seq, TranscriptChunk.id)
+# ONLINE doctors other than the current one, filtered by idx_user_role_status
+TRANSFER_DOCTORS_STMT = select(User.id, User.full_name, User.specialty).where(
+    User.role == UserRole.DOCTOR, User.status == DoctorStatus.ONLINE, User.id != bindparam("doctor_id")
+)
+
+def _list_items(text: str) -> List[str]:
+    return [item for item in LIST_ITEM_PATTERN.findall(text) if item]
+
+def _consult_access(session: Session, consult_id: int):
+    """Participants and status of a consultation, without loading the row"""
+    return session.exec(CONSULT_ACCESS_STMT, params={"consult_id": consult_id}).first()
+
+def _append_transcript_chunk(session: Session, consult_id: int, user_id: int, seq: int, text: str) -> bool:
+    """One small INSERT per transcribed chunk; the full transcript is only rebuilt at the end.
+
+    Chunks for a consultation that is no longer ACTIVE are dropped: end_consultation has
+    already folded the transcript, so they would stay behind as orphaned PHI.
+    """
+    access = _consult_access(session, consult_id)
+    if not access or access.status != ConsultationStatus.ACTIVE:
+        return False
+    session.add(TranscriptChunk(consultation_id=consult_id, user_id=user_id, seq=seq, text_enc=encrypt_phi(text)))
+    session.commit()
+    return True
+
+def _store_transcript_chunk(consult_id: int, user_id: int, seq: int, text: str) -> bool:
+    """_append_transcript_chunk for callers without a request session (WebSocket uploads)"""
+    with Session(engine) as session:
+        return _append_transcript_chunk(session, consult_id, user_id, seq, text)
+
+def _fold_transcript(session: Session, consult: Consultation):
+    """Append pending chunks, labelled with the speaker's name, to transcript_enc and drop them; the caller commits"""
+    chunks = session.exec(TRANSCRIPT_CHUNKS_STMT, params={"consult_id": consult.id}).all()
+    if not chunks:
+        return
+    # Uncached: the chunk ciphertexts are deleted below, so caching would only keep plaintext PHI in memory
+    previous = decrypt_phi(consult.transcript_enc) if consult.transcript_enc else ""
+    texts = [decrypt_phi(chunk.text_enc) for chunk in chunks]
+    lines = [previous] if previous else []
+    lines.extend(f"{chunk.full_name or 'Unknown'}: {text}" for chunk, text in zip(chunks, texts) if text)
+    consult.transcript_enc = encrypt_phi("\n".join(lines))
+    session.exec(delete(TranscriptChunk).where(TranscriptChunk.consultation_id == consult.id))
+
+def _get_consultation(session: Session, consult_id: int, *relationships) -> Optional[Consultation]:
+    """Load a consultation with the given user relationships joined into the same SELECT"""
+    return session.exec(
+        select(Consultation).where(Consultation.id == consult_id).options(*(joinedload(r) for r in relationships))
+    ).first()
 
 # --- Dashboard ---
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token: 
-        return RedirectResponse("/")
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception as e:
-        return RedirectResponse("/")
-
+def dashboard(request: Request, background: BackgroundTasks, session: Session = Depends(get_db), user: User = Depends(current_user)):
     if user.role == UserRole.ADMIN:
-        doctors = session.exec(select(User).where(User.role == UserRole.DOCTOR)).all()
-        logs = session.exec(select(PrivacyLog).order_by(PrivacyLog.timestamp.desc()).limit(50)).all()
-        audit_log(session, user, "Viewed Admin Dashboard", "System Logs", "Administrative Review")
+        doctors = session.exec(DOCTORS_STMT).all()
+        logs = session.exec(RECENT_LOGS_STMT).all()
+        queue_audit_log(background, session, user, "Viewed Admin Dashboard", "System Logs", "Administrative Review")
         return render_template("dashboard_admin", {"request": request, "user": user, "doctors": doctors, "logs": logs})
 
     elif user.role == UserRole.DOCTOR:
-        consultations = session.exec(select(Consultation).where(
-            Consultation.doctor_id == user.id,
-            Consultation.status.in_([ConsultationStatus.ACTIVE, ConsultationStatus.PENDING_PAYMENT])
-        )).all()
-        return render_template("dashboard_doctor", {"request": request, "user": user, "consultations": consultations})
+        cached = doctor_dashboards.get(user.id)
+        if cached is not None:
+            return HTMLResponse(cached)
+        generation = doctor_dashboards.generation(user.id)
+        consultations = session.exec(DOCTOR_CONSULTS_STMT, params={"doctor_id": user.id}).all()
+        response = render_template("dashboard_doctor", {"request": request, "user": user, "consultations": consultations})
+        doctor_dashboards.set(user.id, response.body, generation)
+        return response
 
     elif user.role == UserRole.PATIENT:
-        consult = session.exec(select(Consultation).where(
-            Consultation.patient_id == user.id,
-            Consultation.status.in_([ConsultationStatus.PENDING_PAYMENT, ConsultationStatus.ACTIVE])
-        )).first()
-        logs = session.exec(select(PrivacyLog).where(
-            or_(PrivacyLog.actor_id == user.id, PrivacyLog.target_data != "System Internal")
-        ).order_by(PrivacyLog.timestamp.desc()).limit(10)).all()
-        audit_log(session, user, "Viewed Dashboard", "Privacy Timeline", "Self Review")
+        consult = session.exec(PATIENT_CONSULT_STMT, params={"patient_id": user.id}).first()
+        logs = session.exec(PATIENT_LOGS_STMT, params={"actor_id": user.id}).all()
+        queue_audit_log(background, session, user, "Viewed Dashboard", "Privacy Timeline", "Self Review")
         return render_template("dashboard_patient", {"request": request, "user": user, "active_consultation": consult, "logs": logs})
 
 # --- Triage ---
 @router.post("/triage/start")
-async def start_triage(
+def start_triage(
     request: Request, 
-    specialty: str = Form(...), 
+    specialty: Specialty = Form(...), 
     symptoms: str = Form(...),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    user: User = Depends(current_user),
+    is_json: bool = Depends(wants_json)
 ):
-    token = request.cookies.get("access_token")
-    if not token:
-        if request.headers.get("accept") == "application/json":
-            return JSONResponse(status_code=401, content={"error": "Unauthorized"})
-        return RedirectResponse("/", status_code=303)
-
-    user = await get_current_user_from_token(token, session)
-    
-    doctor = session.exec(select(User).where(
-        User.role == UserRole.DOCTOR,
-        User.specialty == specialty,
-        User.status == DoctorStatus.ONLINE
-    )).first()
+    # Unknown specialties are rejected by form validation before any query runs
+    specialty = specialty.value
+    doctor = session.exec(ONLINE_DOCTOR_STMT, params={"specialty": specialty}).first()
     
     if not doctor:
         # Return JSON response for AJAX handling
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(
                 status_code=404,
                 content={"error": f"No {specialty} doctors are currently available. Please try again later."}
@@ -101,27 +176,20 @@ async def start_triage(
         symptoms_enc=symptoms_enc
     )
     session.add(consult)
-    session.commit()
-    session.refresh(consult)
+    session.flush()
     
-    audit_log(session, user, "Submitted Triage Form", "Symptoms (Encrypted)", "Treatment Request", consult.id)
-    audit_log(session, doctor, "System Assigned Patient", f"Patient #{user.id}", "Triage Algorithm", consult.id)
+    # Both audit entries go out with the consultation in one commit
+    audit_log(session, user, "Submitted Triage Form", "Symptoms (Encrypted)", "Treatment Request", consult.id, commit=False)
+    audit_log(session, doctor, "System Assigned Patient", f"Patient #{user.id}", "Triage Algorithm", consult.id, commit=False)
+    session.commit()
+    doctor_dashboards.invalidate(doctor.id)
     
     return RedirectResponse("/dashboard", status_code=303)
 
 # --- Billing ---
 @router.get("/billing/{consult_id}", response_class=HTMLResponse)
-async def billing_page(request: Request, consult_id: int, session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
-    consult = session.get(Consultation, consult_id)
+def billing_page(request: Request, consult_id: int, session: Session = Depends(get_db), user: User = Depends(current_user)):
+    consult = _get_consultation(session, consult_id, Consultation.doctor)
     if not consult:
         return render_template("dashboard_patient", {
             "request": request,
@@ -134,7 +202,7 @@ async def billing_page(request: Request, consult_id: int, session: Session = Dep
     if consult.patient_id != user.id:
         return RedirectResponse("/dashboard", status_code=303)
     
-    doctor = session.get(User, consult.doctor_id)
+    doctor = consult.doctor
     if not doctor:
         return render_template("dashboard_patient", {
             "request": request,
@@ -152,39 +220,32 @@ async def billing_page(request: Request, consult_id: int, session: Session = Dep
     })
 
 @router.post("/billing/process")
-async def process_payment(
+def process_payment(
     request: Request,
     consultation_id: int = Form(...),
     outcome: str = Form(...),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    user: User = Depends(current_user),
+    is_json: bool = Depends(wants_json)
 ):
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
-    consult = session.get(Consultation, consultation_id)
+    consult = _get_consultation(session, consultation_id, Consultation.doctor)
     if not consult:
         return JSONResponse(
             status_code=404,
             content={"error": "Consultation not found"}
-        ) if request.headers.get("accept") == "application/json" else RedirectResponse("/dashboard")
+        ) if is_json else RedirectResponse("/dashboard")
     
-    doctor = session.get(User, consult.doctor_id)
+    doctor = consult.doctor
     if not doctor:
         return JSONResponse(
             status_code=404,
             content={"error": "Doctor not found"}
-        ) if request.headers.get("accept") == "application/json" else RedirectResponse("/dashboard")
+        ) if is_json else RedirectResponse("/dashboard")
     
     if outcome == "success":
         consult.status = ConsultationStatus.ACTIVE
-        consult.started_at = datetime.utcnow()
-        audit_log(session, doctor, "Authorized Access", "Medical Record", "Payment Confirmed", consult.id)
+        consult.started_at = func.now()
+        audit_log(session, doctor, "Authorized Access", "Medical Record", "Payment Confirmed", consult.id, commit=False)
     else:
         consult.status = ConsultationStatus.CANCELLED
         doctor.status = DoctorStatus.ONLINE 
@@ -192,51 +253,52 @@ async def process_payment(
     session.add(consult)
     session.add(doctor)
     session.commit()
+    doctor_dashboards.invalidate(doctor.id)
     return RedirectResponse("/dashboard", status_code=303)
 
 # --- Consultation ---
 @router.get("/consultation/{consult_id}", response_class=HTMLResponse)
-async def consultation_room(request: Request, consult_id: int, session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
-    consult = session.get(Consultation, consult_id)
-    if not consult:
+def consultation_room(request: Request, background: BackgroundTasks, consult_id: int, session: Session = Depends(get_db), user: User = Depends(current_user)):
+    # Authorize on the three columns involved before hydrating participants and PHI
+    access = session.exec(CONSULT_ACCESS_STMT, params={"consult_id": consult_id}).first()
+    if not access:
         return RedirectResponse("/dashboard")
     
-    if user.id not in [consult.patient_id, consult.doctor_id]: 
+    if user.id not in (access.patient_id, access.doctor_id): 
         return HTMLResponse("Unauthorized Access", status_code=403)
-    if consult.status != ConsultationStatus.ACTIVE: 
+    if access.status != ConsultationStatus.ACTIVE: 
         return RedirectResponse("/dashboard")
     
+    consult = _get_consultation(session, consult_id, Consultation.doctor, Consultation.patient)
+    
     # Decrypt symptoms with error handling
-    symptoms = decrypt_phi(consult.symptoms_enc) if consult.symptoms_enc else ""
+    symptoms = decrypt_phi_cached(consult.symptoms_enc) if consult.symptoms_enc else ""
     if not symptoms:
         symptoms = "Unable to decrypt symptoms data."
     
     # Fetch History (Previous Consultations) - ONLY for doctors
     history = []
     if user.role == UserRole.DOCTOR:
-        prev_consults = session.exec(select(Consultation).where(
-            Consultation.patient_id == consult.patient_id,
-            Consultation.id != consult.id,
-            Consultation.status == ConsultationStatus.COMPLETED
-        ).order_by(Consultation.created_at.desc())).all()
+        # One round-trip for the whole history; outer joins keep consults whose doctor was removed
+        prev_consults = session.exec(
+            select(Consultation, Doctor, Patient)
+            .outerjoin(Doctor, Doctor.id == Consultation.doctor_id)
+            .outerjoin(Patient, Patient.id == Consultation.patient_id)
+            .where(
+                Consultation.patient_id == consult.patient_id,
+                Consultation.id != consult.id,
+                Consultation.status == ConsultationStatus.COMPLETED
+            ).order_by(Consultation.created_at.desc())
+        ).all()
         
-        for pc in prev_consults:
-            doc = session.get(User, pc.doctor_id)
-            patient = session.get(User, pc.patient_id)
-            
-            # Decrypt with better error handling (decrypt_phi now returns empty string on error)
-            symptoms_dec = decrypt_phi(pc.symptoms_enc) if pc.symptoms_enc else ""
-            notes_dec = decrypt_phi(pc.notes_enc) if pc.notes_enc else ""
-            transcript_dec = decrypt_phi(pc.transcript_enc) if pc.transcript_enc else None
+        # Decrypt the whole page in one batch (returns empty string on error), three fields per row
+        decrypted = decrypt_phi_many([
+            field for pc, _, _ in prev_consults
+            for field in (pc.symptoms_enc, pc.notes_enc, pc.transcript_enc)
+        ])
+        
+        for i, (pc, doc, patient) in enumerate(prev_consults):
+            symptoms_dec, notes_dec, transcript_dec = decrypted[3 * i:3 * i + 3]
             
             # If decryption failed (empty string), show user-friendly message
             # This can happen if encryption key changed or data is corrupted
@@ -256,32 +318,14 @@ async def consultation_room(request: Request, consult_id: int, session: Session
                 parts = notes_dec.split("Prescriptions:")
                 clinical_notes = parts[0].strip()
                 prescription_text = parts[1] if len(parts) > 1 else ""
-                # Parse prescription lines
-                lines = prescription_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and (line[0].isdigit() or line.startswith('-')):
-                        # Remove numbering
-                        if line[0].isdigit() and '. ' in line:
-                            line = line.split('. ', 1)[1]
-                        elif line.startswith('- '):
-                            line = line[2:]
-                        prescriptions.append(line)
+                prescriptions = _list_items(prescription_text)
             
             # For files, assume they are listed in notes as "Files:" or similar
             if notes_dec and "Files:" in notes_dec:
                 parts = clinical_notes.split("Files:")
                 clinical_notes = parts[0].strip()
                 file_text = parts[1] if len(parts) > 1 else ""
-                lines = file_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and (line[0].isdigit() or line.startswith('-')):
-                        if line[0].isdigit() and '. ' in line:
-                            line = line.split('. ', 1)[1]
-                        elif line.startswith('- '):
-                            line = line[2:]
-                        files.append(line)
+                files = _list_items(file_text)
             
             history.append({
                 "id": pc.id,
@@ -298,14 +342,24 @@ async def consultation_room(request: Request, consult_id: int, session: Session
             })
     
     # Get current doctor and patient info
-    current_doctor = session.get(User, consult.doctor_id)
-    current_patient = session.get(User, consult.patient_id)
+    current_doctor = consult.doctor
+    current_patient = consult.patient
     
     # Calculate session start timestamp for timer
     session_start = consult.started_at if consult.started_at else consult.created_at
     session_start_timestamp = int(session_start.timestamp() * 1000) if session_start else None
+    
+    # Everything the room script needs, emitted as one JSON document
+    client_config = {
+        "consultId": consult.id,
+        "userId": user.id,
+        "userRole": user.role.value,
+        "sessionStartTimestamp": session_start_timestamp,
+        "currentDoctor": {"id": current_doctor.id, "name": current_doctor.full_name} if current_doctor else None,
+        "currentPatient": {"id": current_patient.id, "name": current_patient.full_name} if current_patient else None
+    }
 
-    audit_log(session, user, "Entered Secure Room", "Video Stream", "Consultation", consult.id)
+    queue_audit_log(background, session, user, "Entered Secure Room", "Video Stream", "Consultation", consult.id)
     return render_template("consultation", {
         "request": request, 
         "user": user, 
@@ -314,20 +368,11 @@ async def consultation_room(request: Request, consult_id: int, session: Session
         "history": history,
         "current_doctor": current_doctor,
         "current_patient": current_patient,
-        "session_start_timestamp": session_start_timestamp
+        "client_config": client_config
     })
 
 @router.post("/consultation/notes")
-async def save_notes(request: Request, consultation_id: int = Form(...), notes: str = Form(...), session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
+def save_notes(request: Request, consultation_id: int = Form(...), notes: str = Form(...), session: Session = Depends(get_db), user: User = Depends(current_user)):
     consult = session.get(Consultation, consultation_id)
     if not consult:
         return RedirectResponse("/dashboard")
@@ -340,23 +385,14 @@ async def save_notes(request: Request, consultation_id: int = Form(...), notes:
     
     consult.notes_enc = encrypt_phi(notes)
     session.add(consult)
+    audit_log(session, user, "Appended Clinical Notes", "Medical Record", "Documentation", consult.id, commit=False)
     session.commit()
-    audit_log(session, user, "Appended Clinical Notes", "Medical Record", "Documentation", consult.id)
     return RedirectResponse(f"/consultation/{consultation_id}", status_code=303)
 
 # --- Transfer Consultation ---
 @router.get("/consultation/{consult_id}/available-doctors", response_class=JSONResponse)
-async def get_available_doctors(request: Request, consult_id: int, session: Session = Depends(get_db)):
+def get_available_doctors(request: Request, consult_id: int, session: Session = Depends(get_db), user: User = Depends(current_user)):
     """Get list of available doctors for transfer"""
-    token = request.cookies.get("access_token")
-    if not token:
-        return JSONResponse(status_code=401, content={"error": "Unauthorized"})
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return JSONResponse(status_code=401, content={"error": "Unauthorized"})
-    
     consult = session.get(Consultation, consult_id)
     if not consult:
         return JSONResponse(status_code=404, content={"error": "Consultation not found"})
@@ -365,96 +401,53 @@ async def get_available_doctors(request: Request, consult_id: int, session: Sess
     if user.id != consult.doctor_id or user.role != UserRole.DOCTOR:
         return JSONResponse(status_code=403, content={"error": "Only the assigned doctor can transfer"})
     
-    # Get all doctors except the current one
-    all_doctors = session.exec(select(User).where(
-        User.role == UserRole.DOCTOR,
-        User.id != consult.doctor_id
-    )).all()
-    
-    # Debug: Log all doctors found
-    print(f"DEBUG: Found {len(all_doctors)} doctors (excluding current doctor {consult.doctor_id})")
-    
-    # Filter to show only ONLINE doctors (exclude BUSY/OFFLINE/None)
-    available_doctors = []
-    for doc in all_doctors:
-        # Handle None status
-        if doc.status is None:
-            print(f"DEBUG: Doctor {doc.id} ({doc.full_name}) has None status, excluding")
-            continue
-            
-        # Handle both enum and string status
-        if hasattr(doc.status, 'value'):
-            status_value = doc.status.value
-        elif isinstance(doc.status, str):
-            status_value = doc.status
-        else:
-            status_value = str(doc.status)
-        
-        status_lower = status_value.lower() if isinstance(status_value, str) else str(status_value).lower()
-        
-        print(f"DEBUG: Doctor {doc.id} ({doc.full_name}) has status: {status_value} (lower: {status_lower})")
-        
-        # Include ONLINE doctors only
-        if status_lower == 'online':
-            available_doctors.append(doc)
-            print(f"DEBUG: Doctor {doc.id} ({doc.full_name}) added to available list")
-        else:
-            print(f"DEBUG: Doctor {doc.id} ({doc.full_name}) excluded (status: {status_lower})")
+    available_doctors = session.exec(TRANSFER_DOCTORS_STMT, params={"doctor_id": consult.doctor_id}).all()
     
     doctors_list = [
         {
             "id": doc.id,
             "name": doc.full_name,
             "specialty": doc.specialty or "General",
-            "status": (doc.status.value if hasattr(doc.status, 'value') else str(doc.status)) if doc.status else "offline"
+            "status": DoctorStatus.ONLINE.value
         }
         for doc in available_doctors
     ]
     
-    print(f"DEBUG: Returning {len(doctors_list)} available doctors")
-    
     return JSONResponse(content={"doctors": doctors_list})
 
 @router.post("/consultation/transfer")
-async def transfer_consultation(
+def transfer_consultation(
     request: Request,
     consultation_id: int = Form(...),
     new_doctor_id: int = Form(...),
     reason: str = Form(None),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    user: User = Depends(current_user),
+    is_json: bool = Depends(wants_json)
 ):
     """Transfer consultation to another doctor"""
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
     consult = session.get(Consultation, consultation_id)
     if not consult:
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(status_code=404, content={"error": "Consultation not found"})
         return RedirectResponse("/dashboard")
     
     # Only the current doctor can transfer
     if user.id != consult.doctor_id or user.role != UserRole.DOCTOR:
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(status_code=403, content={"error": "Only the assigned doctor can transfer"})
         return HTMLResponse("Unauthorized", status_code=403)
     
     # Check if consultation is active
     if consult.status != ConsultationStatus.ACTIVE:
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(status_code=400, content={"error": "Can only transfer active consultations"})
         return RedirectResponse(f"/consultation/{consultation_id}")
     
     # Get new doctor
     new_doctor = session.get(User, new_doctor_id)
     if not new_doctor or new_doctor.role != UserRole.DOCTOR:
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(status_code=404, content={"error": "Doctor not found"})
         return RedirectResponse(f"/consultation/{consultation_id}")
     
@@ -472,7 +465,7 @@ async def transfer_consultation(
     # Allow transfer to ONLINE doctors only
     if status_lower != 'online':
         error_msg = f"Selected doctor ({new_doctor.full_name}) is not available. Current status: {status_value}"
-        if request.headers.get("accept") == "application/json":
+        if is_json:
             return JSONResponse(status_code=400, content={"error": error_msg})
         return RedirectResponse(f"/consultation/{consultation_id}")
     
@@ -482,7 +475,7 @@ async def transfer_consultation(
     # Transfer consultation
     old_doctor_id = consult.doctor_id
     consult.doctor_id = new_doctor_id
-    consult.updated_at = datetime.utcnow()
+    consult.updated_at = func.now()
     
     # Update doctor statuses
     # Old doctor becomes available again
@@ -493,14 +486,15 @@ async def transfer_consultation(
     session.add(consult)
     session.add(old_doctor)
     session.add(new_doctor)
-    session.commit()
     
-    # Audit log
+    # Audit log, committed together with the transfer
     transfer_reason = reason or "Emergency transfer"
-    audit_log(session, user, f"Transferred Patient", f"From Dr. {old_doctor.full_name} to Dr. {new_doctor.full_name}", f"Transfer: {transfer_reason}", consult.id)
-    audit_log(session, new_doctor, "Received Patient Transfer", f"Patient consultation #{consultation_id}", "Patient Care", consult.id)
+    audit_log(session, user, f"Transferred Patient", f"From Dr. {old_doctor.full_name} to Dr. {new_doctor.full_name}", f"Transfer: {transfer_reason}", consult.id, commit=False)
+    audit_log(session, new_doctor, "Received Patient Transfer", f"Patient consultation #{consultation_id}", "Patient Care", consult.id, commit=False)
+    session.commit()
+    doctor_dashboards.invalidate(old_doctor_id, new_doctor_id)
     
-    if request.headers.get("accept") == "application/json":
+    if is_json:
         return JSONResponse(content={
             "success": True,
             "message": f"Patient transferred to Dr. {new_doctor.full_name}",
@@ -510,17 +504,8 @@ async def transfer_consultation(
     return RedirectResponse(f"/consultation/{consultation_id}", status_code=303)
 
 @router.get("/consultation/end/{consult_id}")
-async def end_consultation(request: Request, consult_id: int, session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    if not token:
-        return RedirectResponse("/")
-    
-    try:
-        user = await get_current_user_from_token(token, session)
-    except Exception:
-        return RedirectResponse("/")
-    
-    consult = session.get(Consultation, consult_id)
+def end_consultation(request: Request, consult_id: int, session: Session = Depends(get_db), user: User = Depends(current_user)):
+    consult = _get_consultation(session, consult_id, Consultation.doctor)
     if not consult:
         return RedirectResponse("/dashboard")
     
@@ -528,123 +513,222 @@ async def end_consultation(request: Request, consult_id: int, session: Session =
     if user.id not in [consult.patient_id, consult.doctor_id]:
         return HTMLResponse("Unauthorized Access", status_code=403)
     
-    doctor = session.get(User, consult.doctor_id)
+    doctor = consult.doctor
     if doctor:
         consult.status = ConsultationStatus.COMPLETED
-        consult.ended_at = datetime.utcnow()
+        consult.ended_at = func.now()
         doctor.status = DoctorStatus.ONLINE
+        _fold_transcript(session, consult)
         session.add(consult)
         session.add(doctor)
+        audit_log(session, user, "Ended Consultation", f"Consultation #{consult_id}", "Session Management", consult_id, commit=False)
         session.commit()
-        audit_log(session, user, "Ended Consultation", f"Consultation #{consult_id}", "Session Management", consult_id)
+        doctor_dashboards.invalidate(doctor.id)
     
     return RedirectResponse("/dashboard", status_code=303)
 
 @router.get("/doctor/toggle_status")
-async def toggle_status(request: Request, session: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
-    user = await get_current_user_from_token(token, session)
+def toggle_status(request: Request, session: Session = Depends(get_db), user: User = Depends(current_user)):
     if user.role == UserRole.DOCTOR:
-        user.status = DoctorStatus.ONLINE if user.status == DoctorStatus.OFFLINE else DoctorStatus.OFFLINE
-        session.add(user)
+        # Flip in one atomic UPDATE so concurrent toggles can't overwrite each other
+        session.exec(update(User).where(User.id == user.id).values(
+            status=case(
+                (User.status == DoctorStatus.OFFLINE, literal(DoctorStatus.ONLINE, STATUS_TYPE)),
+                else_=literal(DoctorStatus.OFFLINE, STATUS_TYPE)
+            )
+        ))
         session.commit()
+        doctor_dashboards.invalidate(user.id)
     return RedirectResponse("/dashboard")
 
 # --- WebSocket & Transcription ---
 class ConnectionManager:
-    def __init__(self): self.active_connections: Dict[int, List[WebSocket]] = {}
+    def __init__(self): self.active_connections: Dict[int, Set[WebSocket]] = {}
     async def connect(self, websocket: WebSocket, room_id: int):
         await websocket.accept()
-        if room_id not in self.active_connections: self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
+        self.active_connections.setdefault(room_id, set()).add(websocket)
     
     def disconnect(self, websocket: WebSocket, room_id: int):
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
+        connections = self.active_connections.get(room_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del self.active_connections[room_id]
+
+    async def _send_all(self, message: str, room_id: int, connections: List[WebSocket]):
+        """Sends to all connections concurrently; sockets that fail are dropped from the room"""
+        results = await asyncio.gather(*(c.send_text(message) for c in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection, room_id)
 
     async def broadcast(self, message: str, room_id: int):
         """Sends a message to all users in the room"""
+        connections = self.active_connections.get(room_id)
+        if connections:
+            await self._send_all(message, room_id, list(connections))
+
+    async def broadcast_json(self, payload: dict, room_id: int):
+        """Serializes the payload once (orjson) and sends the same frame to the whole room"""
         if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]: 
-                await connection.send_text(message)
+            await self.broadcast(orjson.dumps(payload).decode(), room_id)
 
     async def broadcast_except(self, message: str, room_id: int, sender_socket: WebSocket):
         """Sends a message to everyone EXCEPT the sender (for WebRTC signaling)"""
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                if connection != sender_socket:
-                    await connection.send_text(message)
+        connections = self.active_connections.get(room_id)
+        if connections:
+            await self._send_all(message, room_id, [c for c in connections if c is not sender_socket])
 
 manager = ConnectionManager()
 
+# Transcriptions started from WebSocket audio frames; held so they aren't garbage collected mid-run
+_transcriptions: Set[asyncio.Task] = set()
+# A 6 s Opus segment is well under 100 KB; anything far larger is not the room's recorder
+MAX_AUDIO_FRAME_BYTES = 1 << 20
+
+async def _broadcast_transcript(consult_id: int, user_id: int, text: str) -> int:
+    timestamp = time.time_ns() // 1_000_000
+    await manager.broadcast_json({
+        "type": "transcript",
+        "user_id": user_id,
+        "text": text,
+        "timestamp": timestamp
+    }, consult_id)
+    return timestamp
+
+async def _transcribe_frame(consult_id: int, user_id: int, audio: bytes):
+    # Each segment is decoded on the Whisper executor and pushed to the room as soon as
+    # it's ready, so the first words show up before the rest of the recording is decoded.
+    # Nothing awaits this task, so failures are logged here instead of lost.
+    try:
+        async with aclosing(aiter_transcript(io.BytesIO(audio))) as segments:
+            async for text in segments:
+                timestamp = await _broadcast_transcript(consult_id, user_id, text)
+                await run_in_threadpool(_store_transcript_chunk, consult_id, user_id, timestamp, text)
+    except Exception:
+        logger.exception("Transcription failed for consultation #%s", consult_id)
+
+def _authorize_socket(session: Session, token: Optional[str], consult_id: int) -> Optional[User]:
+    """The cookie's user when they take part in this ACTIVE consultation, else None"""
+    try:
+        user = get_current_user_from_token(token, session)
+    except HTTPException:
+        return None
+    access = _consult_access(session, consult_id)
+    if not access or access.status != ConsultationStatus.ACTIVE or user.id not in (access.patient_id, access.doctor_id):
+        return None
+    return user
+
+def _parse_frame(data: str) -> Optional[dict]:
+    """Decode frames that look like a JSON object; plain chat text never reaches the parser"""
+    if not data.lstrip().startswith("{"):
+        return None
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return None
+
 @router.websocket("/ws/{consult_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, consult_id: int, user_id: int):
+async def websocket_endpoint(websocket: WebSocket, consult_id: int, user_id: int, session: Session = Depends(get_db)):
     """WebSocket endpoint for chat, signaling, and live transcript."""
+    # Same rules as the consultation room page, checked on the session cookie before accepting
+    user = await run_in_threadpool(_authorize_socket, session, websocket.cookies.get("access_token"), consult_id)
+    # Give the pooled connection back; the socket may stay open for the whole consultation
+    session.close()
+    if user is None or user.id != user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     await manager.connect(websocket, consult_id)
+    transcription: Optional[asyncio.Task] = None
     try:
         while True:
-            data = await websocket.receive_text()
-            try:
-                msg_json = json.loads(data)
-                msg_type = msg_json.get("type")
-
-                # WebRTC signaling should not echo back to sender
-                if msg_type in {"offer", "answer", "candidate"}:
-                    await manager.broadcast_except(data, consult_id, websocket)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Binary frames are recorded audio segments; transcribe them without
+            # holding up signaling and chat on this socket
+            if message.get("bytes") is not None:
+                audio = message["bytes"]
+                if len(audio) > MAX_AUDIO_FRAME_BYTES:
+                    await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                    raise WebSocketDisconnect(status.WS_1009_MESSAGE_TOO_BIG)
+                # At most one segment per socket in flight, so a client that outpaces
+                # Whisper can't queue unbounded work (and memory) for every other room
+                if transcription is not None and not transcription.done():
                     continue
-
-                # Structured chat message
-                if msg_type == "chat":
-                    # Ensure sender metadata is present
-                    msg_json.setdefault("user_id", user_id)
-                    msg_json.setdefault("timestamp", datetime.utcnow().isoformat())
-                    await manager.broadcast(json.dumps(msg_json), consult_id)
-                    continue
-
-                # Unknown structured message – broadcast as-is
-                await manager.broadcast(data, consult_id)
-
-            except json.JSONDecodeError:
+                transcription = asyncio.create_task(_transcribe_frame(consult_id, user_id, audio))
+                _transcriptions.add(transcription)
+                transcription.add_done_callback(_transcriptions.discard)
+                continue
+            data = message["text"]
+            # WebRTC signaling is relayed verbatim; the client puts "type" first, so
+            # a prefix match skips parsing multi-KB SDP payloads
+            if SIGNAL_PATTERN.match(data):
+                await manager.broadcast_except(data, consult_id, websocket)
+                continue
+            msg_json = _parse_frame(data)
+            if msg_json is None:
                 # Plain text fallback -> wrap into chat payload
-                chat_payload = json.dumps({
+                await manager.broadcast_json({
                     "type": "chat",
                     "user_id": user_id,
                     "text": data,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                await manager.broadcast(chat_payload, consult_id)
+                    "timestamp": time.time_ns() // 1_000_000
+                }, consult_id)
+                continue
+
+            msg_type = msg_json.get("type")
+
+            # WebRTC signaling should not echo back to sender
+            if msg_type in SIGNAL_TYPES:
+                await manager.broadcast_except(data, consult_id, websocket)
+                continue
+
+            # Structured chat message
+            if msg_type == "chat":
+                # Ensure sender metadata is present
+                msg_json.setdefault("user_id", user_id)
+                msg_json.setdefault("timestamp", time.time_ns() // 1_000_000)
+                await manager.broadcast_json(msg_json, consult_id)
+                continue
+
+            # Unknown structured message – broadcast as-is
+            await manager.broadcast(data, consult_id)
     except WebSocketDisconnect:
         manager.disconnect(websocket, consult_id)
 
 @router.post("/consultation/transcribe")
 async def transcribe_endpoint(
+    background: BackgroundTasks,
     consultation_id: int = Form(...),
-    user_id: int = Form(...),
     audio_blob: UploadFile = File(...),
-    session: Session = Depends(get_db)
+    session: Session = Depends(get_db),
+    user: User = Depends(current_user)
 ):
-    """Receives audio chunks, transcribes them, and broadcasts via WebSocket"""
+    """Receives audio chunks, transcribes them, and broadcasts via WebSocket.
+
+    The consultation room streams audio over its WebSocket instead; this endpoint
+    remains for clients that upload segments over HTTP.
+    """
+    # Only participants of an ACTIVE consultation may add to its transcript
+    access = await run_in_threadpool(_consult_access, session, consultation_id)
+    if not access:
+        return JSONResponse(status_code=404, content={"error": "Consultation not found"})
+    if user.id not in (access.patient_id, access.doctor_id):
+        return JSONResponse(status_code=403, content={"error": "Not a participant in this consultation"})
+    if access.status != ConsultationStatus.ACTIVE:
+        return JSONResponse(status_code=409, content={"error": "Consultation is not active"})
     
-    # Save temp file
-    temp_filename = f"temp_{consultation_id}_{user_id}_{uuid.uuid4()}.webm"
-    with open(temp_filename, "wb") as buffer:
-        shutil.copyfileobj(audio_blob.file, buffer)
+    # Keep the chunk in memory; faster-whisper decodes file-like objects directly
+    audio = io.BytesIO(await audio_blob.read())
     
-    # Run Faster Whisper
-    text = transcribe_audio_chunk(temp_filename)
+    # Run Faster Whisper on its own executor so inference doesn't block the event loop
+    text = await transcribe_audio_async(audio)
     
     if text:
-        # Prepare JSON message
-        msg = json.dumps({
-            "type": "transcript",
-            "user_id": user_id,
-            "text": text
-        })
-        # Broadcast via WebSocket
-        await manager.broadcast(msg, consultation_id)
+        timestamp = await _broadcast_transcript(consultation_id, user.id, text)
         
-        # Optionally: Append to DB transcript_enc (need to fetch, decrypt, append, encrypt, save)
-        # For performance in this loop, we might skip DB save for every chunk or do it async.
-        # Here we just audit log occasionally.
+        # Persisted after the response; end_consultation folds the chunks into transcript_enc
+        background.add_task(_store_transcript_chunk, consultation_id, user.id, timestamp, text)
         
-    return {"status": "ok", "text": text}
\ No newline at end of file
+    return {"status": "ok", "text": text}
@@ -1,25 +1,89 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException
+from functools import lru_cache
+from typing import List, Optional
+from fastapi import BackgroundTasks, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from cryptography.fernet import Fernet
+from cryptography.hazmat.backends.openssl import backend as openssl_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from sqlmodel import Session, select
 
 from app.config import settings
 from app.database import get_db
 from app.models import User, PrivacyLog, UserRole
 
+logger = logging.getLogger(__name__)
+
 # Encryption Suite
+# New PHI is sealed with AES-256-GCM (one AEAD pass, AES-NI via OpenSSL) under a key
+# derived from ENCRYPTION_KEY; Fernet is kept to read tokens written before the switch.
+def derive_aead(key: bytes) -> AESGCM:
+    """AES-256-GCM cipher for a Fernet-format ENCRYPTION_KEY"""
+    return AESGCM(HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None, info=b"clinicvault-phi-aesgcm"
+    ).derive(base64.urlsafe_b64decode(key)))
+
 cipher_suite = Fernet(settings.ENCRYPTION_KEY)
+aead = derive_aead(settings.ENCRYPTION_KEY)
+AEAD_PREFIX = "g1:"  # Fernet tokens always start with "gAAAAA"
+NONCE_SIZE = 12
+# Passwords are PBKDF2-SHA256 straight through hashlib (OpenSSL); passlib is only kept to
+# verify hashes stored before the switch, which are rewritten on the next successful login
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+PBKDF2_PREFIX = "pbkdf2_sha256"
+PBKDF2_ROUNDS = 29000
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# --- Password Utils ---
+def hash_password(password: str, rounds: int = PBKDF2_ROUNDS) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, rounds)
+    return f"{PBKDF2_PREFIX}${rounds}${salt.hex()}${digest.hex()}"
+
+def verify_password(password: str, stored: str) -> bool:
+    if stored.startswith(PBKDF2_PREFIX + "$"):
+        try:
+            _, rounds, salt, digest = stored.split("$")
+            candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(rounds))
+            return hmac.compare_digest(candidate, bytes.fromhex(digest))
+        except ValueError:
+            return False
+    try:
+        return pwd_context.verify(password, stored)
+    except ValueError:
+        return False
+
+def password_needs_rehash(stored: str) -> bool:
+    """True for hashes still in passlib's format or with fewer than PBKDF2_ROUNDS rounds"""
+    if not stored.startswith(PBKDF2_PREFIX + "$"):
+        return True
+    try:
+        return int(stored.split("$", 2)[1]) < PBKDF2_ROUNDS
+    except ValueError:
+        return True
+
 # --- Encryption Utils ---
 def encrypt_phi(data: str) -> str:
     if not data: return ""
-    return cipher_suite.encrypt(data.encode()).decode()
+    nonce = os.urandom(NONCE_SIZE)
+    return AEAD_PREFIX + base64.urlsafe_b64encode(nonce + aead.encrypt(nonce, data.encode(), None)).decode()
+
+def open_phi(token: str, fernet: Fernet, cipher: AESGCM) -> str:
+    """Decrypt one PHI token with the given key pair; raises on a wrong key or tampering"""
+    if token.startswith(AEAD_PREFIX):
+        sealed = base64.urlsafe_b64decode(token[len(AEAD_PREFIX):])
+        return cipher.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], None).decode()
+    return fernet.decrypt(token).decode()
 
 def decrypt_phi(token: str) -> str:
     if not token: 
@@ -30,7 +94,7 @@ def decrypt_phi(token: str) -> str:
         return ""
     
     try:
-        decrypted = cipher_suite.decrypt(token.encode()).decode()
+        decrypted = open_phi(token, cipher_suite, aead)
         # Return empty string if decryption results in corruption message
         if "[DATA CORRUPTION ERROR]" in decrypted:
             return ""
@@ -38,12 +102,37 @@ def decrypt_phi(token: str) -> str:
     except Exception as e:
         # Log error with more context for debugging
         error_type = type(e).__name__
-        error_msg = str(e) if str(e) else "Unknown error"
         # Only log if it's not a common "invalid token" error (which is expected for old data)
-        if "InvalidToken" not in error_type and "InvalidSignature" not in error_type:
-            print(f"Decryption error ({error_type}): {error_msg}")
+        if error_type not in ("InvalidToken", "InvalidSignature", "InvalidTag"):
+            logger.warning("Decryption error (%s): %s", error_type, e or "Unknown error")
         return ""
 
+@lru_cache(maxsize=4096)
+def decrypt_phi_cached(token: str) -> str:
+    """decrypt_phi memoized by ciphertext; every token carries a random nonce/IV, so edits never hit a stale entry"""
+    return decrypt_phi(token)
+
+def decrypt_phi_many(tokens: List[Optional[str]]) -> List[str]:
+    """Decrypt a batch of PHI tokens with the shared cipher; same per-token semantics as decrypt_phi"""
+    return [decrypt_phi_cached(token) if token else "" for token in tokens]
+
+MIN_AEAD_MB_PER_S = 500
+
+def crypto_self_check() -> float:
+    """Log the linked OpenSSL and a 1 MB AES-GCM encrypt rate; warn when it looks like no AES-NI"""
+    payload = b"x" * (1 << 20)
+    nonce = os.urandom(NONCE_SIZE)
+    start = time.perf_counter()
+    aead.encrypt(nonce, payload, None)
+    rate = 1 / max(time.perf_counter() - start, 1e-9)
+    logger.info("%s, AES-GCM %.0f MB/s", openssl_backend.openssl_version_text(), rate)
+    if rate < MIN_AEAD_MB_PER_S:
+        logger.warning(
+            "AES-GCM throughput %.0f MB/s is below %d MB/s; check that OpenSSL uses AES-NI "
+            "(glibc-based image, OPENSSL_ia32cap unset)", rate, MIN_AEAD_MB_PER_S
+        )
+    return rate
+
 # --- Auth Utils ---
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -51,7 +140,12 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-async def get_current_user_from_token(token: str, session: Session) -> User:
+@lru_cache(maxsize=1024)
+def _decode_token(token: str) -> dict:
+    """Verify the JWT signature once per distinct token; callers must not mutate the result"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+def get_current_user_from_token(token: str, session: Session) -> User:
     """Helper function to get user from token string (for cookie-based auth)"""
     if not token:
         raise HTTPException(status_code=401, detail="Missing authentication token")
@@ -59,7 +153,10 @@ async def get_current_user_from_token(token: str, session: Session) -> User:
     if token.startswith("Bearer "):
         token = token[7:]
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = _decode_token(token)
+        # Cached payloads skip jose's exp check, so enforce expiry on every call
+        if payload.get("exp", 0) <= time.time():
+            raise JWTError("Signature has expired")
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
@@ -71,12 +168,33 @@ async def get_current_user_from_token(token: str, session: Session) -> User:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_db)):
     """Dependency for OAuth2 token-based authentication"""
-    return await get_current_user_from_token(token, session)
+    return get_current_user_from_token(token, session)
+
+def current_user(request: Request, session: Session = Depends(get_db)) -> User:
+    """Dependency for cookie-based routes; the resolved user is kept on request.state for the rest of the request"""
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        user = get_current_user_from_token(token, session)
+    except HTTPException:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    request.state.user = user
+    return user
 
-def audit_log(session: Session, actor: User, action: str, target: str, purpose: str, consult_id: Optional[int] = None):
-    log = PrivacyLog(
+def require_admin(user: User = Depends(current_user)) -> User:
+    """Dependency for admin routes; raises 401/403 for the app's HTTP error handler"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only administrators can perform this action")
+    return user
+
+def _privacy_log(actor: User, action: str, target: str, purpose: str, consult_id: Optional[int]) -> PrivacyLog:
+    return PrivacyLog(
         consultation_id=consult_id,
         actor_id=actor.id,
         actor_name=f"{actor.full_name} ({actor.role.value})",
@@ -84,5 +202,23 @@ def audit_log(session: Session, actor: User, action: str, target: str, purpose:
         target_data=target,
         purpose=purpose
     )
-    session.add(log)
-    session.commit()
\ No newline at end of file
+
+def audit_log(session: Session, actor: User, action: str, target: str, purpose: str, consult_id: Optional[int] = None, commit: bool = True):
+    """Record a PrivacyLog entry; pass commit=False to write it with the caller's own commit"""
+    session.add(_privacy_log(actor, action, target, purpose, consult_id))
+    if commit:
+        session.commit()
+
+def _write_audit_log(bind, log: PrivacyLog):
+    with Session(bind) as session:
+        session.add(log)
+        session.commit()
+
+def queue_audit_log(background: BackgroundTasks, session: Session, actor: User, action: str, target: str, purpose: str, consult_id: Optional[int] = None):
+    """Record a view-only PrivacyLog entry after the response, in its own short-lived session.
+
+    The entry is built now while `actor` is still loaded; the task never touches the request
+    session, so it doesn't matter whether get_db has already closed it. State changes must
+    use audit_log(commit=False) inside their own transaction instead.
+    """
+    background.add_task(_write_audit_log, session.get_bind(), _privacy_log(actor, action, target, purpose, consult_id))
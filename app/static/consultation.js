@@ -0,0 +1,770 @@
+// Parse consultation data from JSON
+const consultationData = JSON.parse(document.getElementById('consultation-data').textContent);
+const consultId = consultationData.consultId;
+const userId = consultationData.userId;
+const userRole = consultationData.userRole;
+const sessionStartTimestamp = consultationData.sessionStartTimestamp || Date.now();
+
+// Map user IDs to real names for chat/transcript labels
+const userDirectory = {};
+if (consultationData.currentDoctor?.id && consultationData.currentDoctor?.name) {
+    userDirectory[String(consultationData.currentDoctor.id)] = consultationData.currentDoctor.name;
+}
+if (consultationData.currentPatient?.id && consultationData.currentPatient?.name) {
+    userDirectory[String(consultationData.currentPatient.id)] = consultationData.currentPatient.name;
+}
+
+function getDisplayName(id) {
+    if (id === userId) return "Me";
+    if (id == null) return "User";
+    return userDirectory[String(id)] || `User ${id}`;
+}
+// Use wss:// for HTTPS, ws:// for HTTP
+const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+const wsUrl = wsProtocol + "//" + window.location.host + "/ws/" + consultId + "/" + userId;
+let ws;
+
+// Initialize WebSocket with error handling
+try {
+    ws = new WebSocket(wsUrl);
+} catch (error) {
+    console.error('WebSocket connection error:', error);
+}
+
+const localVideo = document.getElementById('localVideo');
+const remoteVideo = document.getElementById('remoteVideo');
+
+// Chat & Transcript Elements
+const chatBox = document.getElementById('chat-box');
+const transcriptBox = document.getElementById('transcript-box');
+const transcriptPlaceholder = document.getElementById('transcript-placeholder');
+const transcriptOverlay = document.getElementById('transcriptOverlay');
+const liveIndicator = document.getElementById('live-indicator');
+const toggleOverlayBtn = document.getElementById('toggleOverlay');
+
+// Overlay hides 4 s after the latest line; one pending timer re-arms itself instead of
+// being cleared and recreated for every transcript chunk
+const OVERLAY_HIDE_MS = 4000;
+let overlayShownAt = 0;
+let overlayTimer = null;
+
+function hideStaleOverlay() {
+    const remaining = overlayShownAt + OVERLAY_HIDE_MS - performance.now();
+    if (remaining > 0) {
+        overlayTimer = setTimeout(hideStaleOverlay, remaining);
+        return;
+    }
+    overlayTimer = null;
+    if (transcriptOverlay) {
+        transcriptOverlay.style.display = 'none';
+    }
+}
+
+// WebSocket error handling
+if (ws) {
+    ws.onerror = function(error) {
+        console.error('WebSocket error:', error);
+        if (chatBox) {
+            const errorDiv = document.createElement('div');
+            errorDiv.className = 'alert alert-warning';
+            errorDiv.textContent = 'Connection error. Please refresh the page.';
+            chatBox.appendChild(errorDiv);
+        }
+    };
+
+    ws.onclose = function(event) {
+        console.log('WebSocket closed:', event.code, event.reason);
+        if (chatBox) {
+            const closeDiv = document.createElement('div');
+            closeDiv.className = 'alert alert-info';
+            closeDiv.textContent = 'Connection closed. Refresh to reconnect.';
+            chatBox.appendChild(closeDiv);
+        }
+    };
+
+    ws.onopen = function() {
+        console.log('WebSocket connected');
+    };
+}
+
+// WebRTC Config
+const rtcConfig = { iceServers: [{ urls: "stun:stun.l.google.com:19302" }] };
+let peerConnection;
+let localStream;
+
+const buildChatPayload = (text) => JSON.stringify({
+    type: "chat",
+    user_id: userId,
+    text: text.trim()
+});
+
+// --- WebSocket Handling ---
+if (ws) {
+    ws.onmessage = async function(event) {
+        try {
+            const msg = JSON.parse(event.data);
+
+            if (msg.type === "transcript") {
+                handleTranscript(msg);
+                return;
+            }
+            if (msg.type === "chat") {
+                const senderLabel = getDisplayName(msg.user_id);
+                addChatMessage(senderLabel, msg.text || "");
+                return;
+            }
+            if (msg.type === "offer") { await handleOffer(msg); return; }
+            if (msg.type === "answer") { await handleAnswer(msg); return; }
+            if (msg.type === "candidate") { await handleCandidate(msg); return; }
+
+            // Unknown structured message -> show raw
+            addChatMessage("System", JSON.stringify(msg));
+        } catch (e) {
+            // Plain text fallback (chat)
+            addChatMessage("System", event.data);
+        }
+    };
+}
+
+// Appends are batched per animation frame: bursts of chat/transcript messages cost
+// one layout and one scroll per frame instead of one per message
+const pendingAppends = new Map();
+
+function queueAppend(container, node) {
+    let fragment = pendingAppends.get(container);
+    if (!fragment) {
+        fragment = document.createDocumentFragment();
+        pendingAppends.set(container, fragment);
+        if (pendingAppends.size === 1) requestAnimationFrame(flushAppends);
+    }
+    fragment.appendChild(node);
+}
+
+function flushAppends() {
+    pendingAppends.forEach((fragment, container) => {
+        container.appendChild(fragment);
+        container.scrollTop = container.scrollHeight;
+    });
+    pendingAppends.clear();
+}
+
+function handleTranscript(msg) {
+    if (!msg || !msg.text) return;
+    
+    // 1. Show in Video Overlay (if enabled)
+    if (toggleOverlayBtn && toggleOverlayBtn.checked && transcriptOverlay) {
+        transcriptOverlay.textContent = msg.text;
+        transcriptOverlay.style.display = 'block';
+
+        overlayShownAt = performance.now();
+        if (!overlayTimer) {
+            overlayTimer = setTimeout(hideStaleOverlay, OVERLAY_HIDE_MS);
+        }
+    }
+
+    // 2. Show in Dedicated Transcript Panel
+    if (!transcriptBox) return;
+    
+    if (transcriptPlaceholder) transcriptPlaceholder.style.display = 'none';
+
+    const div = document.createElement('div');
+    div.className = 'mb-2 p-2 bg-white border rounded shadow-sm';
+    // Names and transcript text come from other participants: set as text, never parsed as HTML
+    const speakerLabel = document.createElement('small');
+    speakerLabel.className = 'd-block text-primary fw-bold mb-1';
+    speakerLabel.textContent = getDisplayName(msg.user_id);
+    div.append(speakerLabel, msg.text);
+    queueAppend(transcriptBox, div);
+
+    // 3. Show 'Live' badge on tab if not active
+    if (liveIndicator) {
+        liveIndicator.classList.remove('d-none');
+        setTimeout(() => {
+            if (liveIndicator) {
+                liveIndicator.classList.add('d-none');
+            }
+        }, 2000);
+    }
+}
+
+function addChatMessage(sender, text) {
+    if (!chatBox) return;
+    
+    const div = document.createElement('div');
+    div.className = 'mb-2 p-2 bg-white border rounded';
+    // Simple check to distinguish 'Me' from others
+    if (sender === "Me") {
+         div.style.borderLeft = "4px solid #0d6efd";
+    }
+    const senderLabel = document.createElement('strong');
+    senderLabel.textContent = sender || 'System';
+    div.append(senderLabel, `: ${text || ''}`);
+    queueAppend(chatBox, div);
+}
+
+// --- Chat ---
+const msgInput = document.getElementById('msg-input');
+if (msgInput) {
+    msgInput.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter' && this.value.trim()) {
+            if (ws && ws.readyState === WebSocket.OPEN) {
+                ws.send(buildChatPayload(this.value));
+                this.value = '';
+            } else {
+                if (typeof showToast !== 'undefined') {
+                    showToast('Connection not available. Please refresh the page.', 'error');
+                } else {
+                    alert('Connection not available. Please refresh the page.');
+                }
+            }
+        }
+    });
+}
+
+// --- WebRTC Logic ---
+async function startCall() {
+    try {
+        if (!localVideo || !remoteVideo) {
+            if (typeof showToast !== 'undefined') {
+                showToast('Video elements not found', 'error');
+            } else {
+                alert('Video elements not found');
+            }
+            return;
+        }
+        
+        localStream = await navigator.mediaDevices.getUserMedia({ video: true, audio: true });
+        localVideo.srcObject = localStream;
+
+        peerConnection = new RTCPeerConnection(rtcConfig);
+        peerConnection.onicecandidate = e => {
+            if(e.candidate && ws && ws.readyState === WebSocket.OPEN) {
+                ws.send(JSON.stringify({ type: "candidate", candidate: e.candidate }));
+            }
+        };
+        peerConnection.ontrack = e => {
+            if (remoteVideo) {
+                remoteVideo.srcObject = e.streams[0];
+            }
+        };
+        localStream.getTracks().forEach(track => peerConnection.addTrack(track, localStream));
+
+        const offer = await peerConnection.createOffer();
+        await peerConnection.setLocalDescription(offer);
+        
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: "offer", sdp: offer }));
+        } else {
+            if (typeof showToast !== 'undefined') {
+                showToast('WebSocket not connected. Please refresh the page.', 'error');
+            } else {
+                alert('WebSocket not connected. Please refresh the page.');
+            }
+            return;
+        }
+
+        if (startCallBtn) {
+            startCallBtn.style.display = 'none';
+        }
+    } catch (error) {
+        console.error('Error starting call:', error);
+        if (typeof showToast !== 'undefined') {
+            showToast('Failed to start video call: ' + error.message, 'error');
+        } else {
+            alert('Failed to start video call: ' + error.message);
+        }
+    }
+}
+
+async function handleOffer(msg) {
+    try {
+        if(!localStream) {
+            localStream = await navigator.mediaDevices.getUserMedia({ video: true, audio: true });
+            if (localVideo) {
+                localVideo.srcObject = localStream;
+            }
+        }
+
+        peerConnection = new RTCPeerConnection(rtcConfig);
+        peerConnection.onicecandidate = e => {
+            if(e.candidate && ws && ws.readyState === WebSocket.OPEN) {
+                ws.send(JSON.stringify({ type: "candidate", candidate: e.candidate }));
+            }
+        };
+        peerConnection.ontrack = e => {
+            if (remoteVideo) {
+                remoteVideo.srcObject = e.streams[0];
+            }
+        };
+        localStream.getTracks().forEach(track => peerConnection.addTrack(track, localStream));
+
+        await peerConnection.setRemoteDescription(new RTCSessionDescription(msg.sdp));
+        const answer = await peerConnection.createAnswer();
+        await peerConnection.setLocalDescription(answer);
+        
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: "answer", sdp: answer }));
+        }
+    } catch (error) {
+        console.error('Error handling offer:', error);
+    }
+}
+
+async function handleAnswer(msg) {
+    try {
+        if (peerConnection) {
+            await peerConnection.setRemoteDescription(new RTCSessionDescription(msg.sdp));
+        }
+    } catch (error) {
+        console.error('Error handling answer:', error);
+    }
+}
+
+async function handleCandidate(msg) {
+    try {
+        if(peerConnection && msg.candidate) {
+            await peerConnection.addIceCandidate(new RTCIceCandidate(msg.candidate));
+        }
+    } catch (error) {
+        console.error('Error handling candidate:', error);
+    }
+}
+
+const startCallBtn = document.getElementById('startCallBtn');
+if (startCallBtn) {
+    startCallBtn.addEventListener('click', startCall);
+}
+
+// --- ROBUST Audio Transcription Logic ---
+// Filter out tiny audio blobs to prevent backend processing errors.
+// Each segment is a complete recording (the recorder restarts so every blob carries
+// its container header) sent as one binary frame on the room WebSocket.
+const AUDIO_SEGMENT_MS = 6000;
+
+let isRecording = false;
+let recorderStream = null;
+const recordBtn = document.getElementById('recordBtn');
+
+async function startAudioLoop() {
+    if (!isRecording) return;
+
+    if (!recorderStream) {
+         recorderStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    }
+
+    const mediaRecorder = new MediaRecorder(recorderStream);
+    const audioChunks = [];
+
+    mediaRecorder.ondataavailable = event => {
+        audioChunks.push(event.data);
+    };
+
+    mediaRecorder.onstop = async () => {
+        const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+
+        // IGNORE tiny blobs (less than 1KB) which are usually just empty headers
+        if (audioBlob.size > 1024 && isRecording && ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(audioBlob);
+        }
+
+        if (isRecording) {
+            startAudioLoop();
+        }
+    };
+
+    mediaRecorder.start();
+
+    setTimeout(() => {
+        if (mediaRecorder.state === "recording") {
+            mediaRecorder.stop();
+        }
+    }, AUDIO_SEGMENT_MS);
+}
+
+if (recordBtn) {
+    recordBtn.addEventListener('click', async () => {
+        if (!isRecording) {
+            isRecording = true;
+            recordBtn.innerHTML = '<i class="fas fa-stop"></i> Stop Transcription';
+            recordBtn.classList.replace('btn-outline-light', 'btn-danger');
+            startAudioLoop();
+        } else {
+            isRecording = false;
+            recordBtn.innerHTML = '<i class="fas fa-microphone"></i> Start Transcription';
+            recordBtn.classList.replace('btn-danger', 'btn-outline-light');
+        }
+    });
+}
+
+// --- Consultation Timer ---
+let timerInterval;
+
+function updateTimer() {
+    const now = Date.now();
+    const diff = Math.max(0, Math.floor((now - sessionStartTimestamp) / 1000)); // seconds
+    const hours = Math.floor(diff / 3600);
+    const minutes = Math.floor((diff % 3600) / 60);
+    const seconds = diff % 60;
+    
+    const timerDisplay = document.getElementById('timerDisplay');
+    if (timerDisplay) {
+        timerDisplay.textContent = 
+            String(hours).padStart(2, '0') + ':' + 
+            String(minutes).padStart(2, '0') + ':' + 
+            String(seconds).padStart(2, '0');
+    }
+}
+
+if (typeof sessionStartTimestamp !== 'undefined' && typeof sessionStartTimestamp === 'number') {
+    timerInterval = setInterval(updateTimer, 1000);
+    updateTimer(); // Initial call
+}
+
+// --- Video Controls ---
+const muteBtn = document.getElementById('muteBtn');
+const videoToggleBtn = document.getElementById('videoToggleBtn');
+let isMuted = false;
+let isVideoOff = false;
+
+function setupVideoControls() {
+    if (muteBtn && localStream) {
+        muteBtn.style.display = 'inline-block';
+        muteBtn.addEventListener('click', () => {
+            isMuted = !isMuted;
+            localStream.getAudioTracks().forEach(track => {
+                track.enabled = !isMuted;
+            });
+            muteBtn.innerHTML = isMuted ? '<i class="fas fa-microphone-slash"></i>' : '<i class="fas fa-microphone"></i>';
+            muteBtn.classList.toggle('btn-danger', isMuted);
+            muteBtn.classList.toggle('btn-outline-light', !isMuted);
+        });
+    }
+
+    if (videoToggleBtn && localStream) {
+        videoToggleBtn.style.display = 'inline-block';
+        videoToggleBtn.addEventListener('click', () => {
+            isVideoOff = !isVideoOff;
+            localStream.getVideoTracks().forEach(track => {
+                track.enabled = !isVideoOff;
+            });
+            videoToggleBtn.innerHTML = isVideoOff ? '<i class="fas fa-video-slash"></i>' : '<i class="fas fa-video"></i>';
+            videoToggleBtn.classList.toggle('btn-danger', isVideoOff);
+            videoToggleBtn.classList.toggle('btn-outline-light', !isVideoOff);
+        });
+    }
+}
+
+// Store original startCall function and wrap it to setup video controls
+const originalStartCallFunction = startCall;
+window.startCall = async function() {
+    await originalStartCallFunction();
+    setTimeout(setupVideoControls, 500);
+}
+
+// --- Notes Templates ---
+const templates = {
+    routine: "Patient presents for routine checkup. General appearance: well-appearing. Vital signs stable. Physical examination unremarkable. Assessment: Healthy. Plan: Continue current care, routine follow-up in 1 year.",
+    followup: "Follow-up visit for [condition]. Patient reports [improvement/no change/worsening]. Examination findings: [findings]. Assessment: [diagnosis]. Plan: [treatment plan].",
+    prescription: "Medication review completed. Current medications: [list]. No new medications required. Continue current regimen. Patient counseled on medication compliance and side effects."
+};
+
+document.querySelectorAll('.template-btn').forEach(btn => {
+    btn.addEventListener('click', function() {
+        const template = templates[this.dataset.template];
+        const textarea = document.getElementById('notesTextarea');
+        if (textarea && template) {
+            textarea.value = template;
+            updateCharCount();
+            if (typeof showToast !== 'undefined') {
+                showToast('Template loaded. Please customize as needed.', 'info');
+            }
+        }
+    });
+});
+
+// --- Notes Character Counter ---
+const notesTextarea = document.getElementById('notesTextarea');
+const notesCharCount = document.getElementById('notesCharCount');
+
+function updateCharCount() {
+    if (notesTextarea && notesCharCount) {
+        const count = notesTextarea.value.length;
+        notesCharCount.textContent = count + ' characters';
+        notesCharCount.classList.toggle('text-danger', count > 2000);
+    }
+}
+
+if (notesTextarea) {
+    notesTextarea.addEventListener('input', updateCharCount);
+    updateCharCount();
+}
+
+// --- Vital Signs ---
+function saveVitals() {
+    const bp = document.getElementById('vitalBP').value;
+    const temp = document.getElementById('vitalTemp').value;
+    const pulse = document.getElementById('vitalPulse').value;
+    const o2 = document.getElementById('vitalO2').value;
+    
+    if (!bp && !temp && !pulse && !o2) {
+        if (typeof showToast !== 'undefined') {
+            showToast('Please enter at least one vital sign', 'warning');
+        }
+        return;
+    }
+    
+    let vitalsText = 'Vital Signs:\n';
+    if (bp) vitalsText += `BP: ${bp} mmHg\n`;
+    if (temp) vitalsText += `Temperature: ${temp}°F\n`;
+    if (pulse) vitalsText += `Pulse: ${pulse} bpm\n`;
+    if (o2) vitalsText += `O2 Saturation: ${o2}%\n`;
+    
+    const textarea = document.getElementById('notesTextarea');
+    if (textarea) {
+        const currentNotes = textarea.value;
+        textarea.value = currentNotes ? currentNotes + '\n\n' + vitalsText : vitalsText;
+        updateCharCount();
+        if (typeof showToast !== 'undefined') {
+            showToast('Vital signs added to notes', 'success');
+        }
+    }
+}
+
+// --- Prescription Management ---
+let prescriptions = [];
+
+function addPrescription() {
+    const med = document.getElementById('prescriptionMed').value;
+    const dose = document.getElementById('prescriptionDose').value;
+    const freq = document.getElementById('prescriptionFreq').value;
+    const duration = document.getElementById('prescriptionDuration').value;
+    
+    if (!med) {
+        if (typeof showToast !== 'undefined') {
+            showToast('Please enter medication name', 'warning');
+        }
+        return;
+    }
+    
+    const prescription = {
+        med: med,
+        dose: dose || 'As directed',
+        freq: freq || 'As needed',
+        duration: duration || 'Until finished'
+    };
+    
+    prescriptions.push(prescription);
+    updatePrescriptionList();
+    
+    // Clear inputs
+    document.getElementById('prescriptionMed').value = '';
+    document.getElementById('prescriptionDose').value = '';
+    document.getElementById('prescriptionFreq').value = '';
+    document.getElementById('prescriptionDuration').value = '';
+    
+    if (typeof showToast !== 'undefined') {
+        showToast('Prescription added', 'success');
+    }
+}
+
+function escapeHtml(value) {
+    const span = document.createElement('span');
+    span.textContent = value == null ? '' : String(value);
+    return span.innerHTML;
+}
+
+function updatePrescriptionList() {
+    const list = document.getElementById('prescriptionList');
+    if (!list) return;
+    
+    if (prescriptions.length === 0) {
+        list.innerHTML = '<small class="text-muted">No prescriptions added</small>';
+        return;
+    }
+    
+    list.innerHTML = prescriptions.map((p, idx) => `
+        <div class="border rounded p-2 mb-2 small">
+            <div class="d-flex justify-content-between align-items-start">
+                <div>
+                    <strong>${escapeHtml(p.med)}</strong><br>
+                    <span class="text-muted">${escapeHtml(p.dose)} - ${escapeHtml(p.freq)} - ${escapeHtml(p.duration)}</span>
+                </div>
+                <button class="btn btn-sm btn-link text-danger p-0" onclick="removePrescription(${idx})" title="Remove">
+                    <i class="fas fa-times"></i>
+                </button>
+            </div>
+        </div>
+    `).join('');
+}
+
+function removePrescription(idx) {
+    prescriptions.splice(idx, 1);
+    updatePrescriptionList();
+}
+
+function copyPrescriptionToNotes() {
+    if (prescriptions.length === 0) {
+        if (typeof showToast !== 'undefined') {
+            showToast('No prescriptions to copy', 'warning');
+        }
+        return;
+    }
+    
+    let prescriptionText = 'Prescriptions:\n';
+    prescriptions.forEach((p, idx) => {
+        prescriptionText += `${idx + 1}. ${p.med} - ${p.dose}, ${p.freq}, ${p.duration}\n`;
+    });
+    
+    const textarea = document.getElementById('notesTextarea');
+    if (textarea) {
+        const currentNotes = textarea.value;
+        textarea.value = currentNotes ? currentNotes + '\n\n' + prescriptionText : prescriptionText;
+        updateCharCount();
+        if (typeof showToast !== 'undefined') {
+            showToast('Prescriptions copied to notes', 'success');
+        }
+    }
+}
+
+function copyFilesToNotes() {
+    if (uploadedFiles.length === 0) {
+        if (typeof showToast !== 'undefined') {
+            showToast('No files to copy', 'warning');
+        }
+        return;
+    }
+    
+    let filesText = 'Files:\n';
+    uploadedFiles.forEach((f, idx) => {
+        filesText += `${idx + 1}. ${f.name} (${(f.size / 1024).toFixed(1)} KB)\n`;
+    });
+    
+    const textarea = document.getElementById('notesTextarea');
+    if (textarea) {
+        const currentNotes = textarea.value;
+        textarea.value = currentNotes ? currentNotes + '\n\n' + filesText : filesText;
+        updateCharCount();
+        if (typeof showToast !== 'undefined') {
+            showToast('Files copied to notes', 'success');
+        }
+    }
+}
+
+// Make functions global
+window.removePrescription = removePrescription;
+window.addPrescription = addPrescription;
+window.copyPrescriptionToNotes = copyPrescriptionToNotes;
+window.copyFilesToNotes = copyFilesToNotes;
+window.saveVitals = saveVitals;
+
+// --- File Upload ---
+let uploadedFiles = [];
+
+function uploadFile() {
+    const fileInput = document.getElementById('fileUpload');
+    if (!fileInput || !fileInput.files.length) {
+        if (typeof showToast !== 'undefined') {
+            showToast('Please select a file to upload', 'warning');
+        }
+        return;
+    }
+    
+    Array.from(fileInput.files).forEach(file => {
+        const fileObj = {
+            name: file.name,
+            size: file.size,
+            type: file.type,
+            file: file
+        };
+        uploadedFiles.push(fileObj);
+    });
+    
+    updateFileList();
+    fileInput.value = '';
+    
+    if (typeof showToast !== 'undefined') {
+        showToast(`Added ${fileInput.files.length} file(s) to consultation`, 'success');
+    }
+}
+
+function updateFileList() {
+    const list = document.getElementById('fileList');
+    if (!list) return;
+    
+    if (uploadedFiles.length === 0) {
+        list.innerHTML = '<small class="text-muted">No files uploaded</small>';
+        return;
+    }
+    
+    list.innerHTML = uploadedFiles.map((f, idx) => `
+        <div class="border rounded p-2 mb-2 small d-flex justify-content-between align-items-center">
+            <div>
+                <i class="fas fa-file me-1"></i>
+                <strong>${escapeHtml(f.name)}</strong>
+                <small class="text-muted">(${(f.size / 1024).toFixed(1)} KB)</small>
+            </div>
+            <button class="btn btn-sm btn-link text-danger p-0" onclick="removeFile(${idx})" title="Remove">
+                <i class="fas fa-times"></i>
+            </button>
+        </div>
+    `).join('');
+}
+
+function removeFile(idx) {
+    uploadedFiles.splice(idx, 1);
+    updateFileList();
+}
+
+window.uploadFile = uploadFile;
+window.removeFile = removeFile;
+updateFileList();
+
+// --- Actions Log ---
+let actionsLog = [];
+
+function logAction(actionText) {
+    const timestamp = new Date().toLocaleTimeString();
+    actionsLog.push({
+        time: timestamp,
+        action: actionText
+    });
+    
+    updateActionsLog();
+    
+    // Also add to notes if doctor wants
+    const textarea = document.getElementById('notesTextarea');
+    if (textarea) {
+        const currentNotes = textarea.value;
+        const actionNote = `[${timestamp}] ${actionText}`;
+        textarea.value = currentNotes ? currentNotes + '\n' + actionNote : actionNote;
+        updateCharCount();
+    }
+    
+    if (typeof showToast !== 'undefined') {
+        showToast('Action logged', 'success');
+    }
+}
+
+function updateActionsLog() {
+    const log = document.getElementById('actionsLog');
+    if (!log) return;
+    
+    if (actionsLog.length === 0) {
+        log.innerHTML = '<div class="text-muted text-center">No actions recorded yet</div>';
+        return;
+    }
+    
+    log.innerHTML = actionsLog.map(a => `
+        <div class="border-start border-primary ps-2 mb-2 small">
+            <div class="text-muted">${escapeHtml(a.time)}</div>
+            <div>${escapeHtml(a.action)}</div>
+        </div>
+    `).join('');
+}
+
+window.logAction = logAction;
+
+// Log initial action
+if (userRole === 'doctor') {
+    logAction('Consultation session started');
+}
@@ -1,16 +1,56 @@
 from fastapi.responses import HTMLResponse
-from jinja2 import Environment, FileSystemLoader
+from functools import lru_cache
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 import os
+import re
 
 
 # Get the templates directory (app/templates)
 template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
 
-# Create Jinja2 environment with file system loader
-env = Environment(loader=FileSystemLoader(template_dir))
+HTML_COMMENT_PATTERN = re.compile(r'<!--(?!\[if).*?-->', re.S)
+INDENT_PATTERN = re.compile(r'^\s*\n|^[ \t]+|[ \t]+$', re.M)
+
+class MinifyingLoader(FileSystemLoader):
+    """Drops HTML comments, indentation and blank lines before Jinja compiles a template.
+
+    Line breaks are kept so inline scripts (`//` comments, ASI) behave exactly as written;
+    the templates have no <pre> blocks or pre-filled textareas whose whitespace matters.
+    """
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        return INDENT_PATTERN.sub("", HTML_COMMENT_PATTERN.sub("", source)), filename, uptodate
+
+# Compiled template code is shared on disk so restarted/extra uvicorn workers skip codegen;
+# entries are keyed by template name + source checksum. Defaults to a per-user temp dir.
+bytecode_dir = os.getenv("JINJA_CACHE_DIR")
+if bytecode_dir:
+    os.makedirs(bytecode_dir, exist_ok=True)
+
+# One environment per process; compiled templates stay cached in it. Templates only change
+# on deploy, so auto_reload=False skips the per-render mtime stat of the source file.
+env = Environment(
+    loader=MinifyingLoader(template_dir),
+    bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+    auto_reload=False,
+    trim_blocks=True,  # no blank line left behind by each {% if %}/{% for %} line
+    lstrip_blocks=True,
+    # Names, PHI, audit entries and form echoes all reach these pages; escaping is the
+    # default so a new {{ }} can't forget it (markupsafe's C escape costs little on ids)
+    autoescape=select_autoescape(["html"])
+)
+
+# Compile every template at import so no request pays lex/parse/codegen
+_compiled = {name: env.get_template(name) for name in env.list_templates(extensions=["html"])}
+
+@lru_cache(maxsize=16)
+def _render_static(name: str) -> bytes:
+    """Pages rendered without context (login, register) are identical bytes every time"""
+    return _compiled[name].render().encode("utf-8")
 
 def render_template(name: str, context: dict):
     if not name.endswith('.html'):
         name += '.html'
-    template = env.get_template(name)
-    return HTMLResponse(template.render(**context))
\ No newline at end of file
+    if not context:
+        return HTMLResponse(_render_static(name))
+    return HTMLResponse(_compiled[name].render(**context))
\ No newline at end of file
@@ -1,112 +1,207 @@
+import asyncio
 import os
+import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Iterator, Union
 try:
-    from faster_whisper import WhisperModel
+    import numpy as np
+    from faster_whisper import WhisperModel, decode_audio
     WHISPER_AVAILABLE = True
 except ImportError:
     WHISPER_AVAILABLE = False
     WhisperModel = None
 
+logger = logging.getLogger(__name__)
+
 # -------------------------------
 # Thread-safe global model cache
 # -------------------------------
 _model = None
 _model_lock = threading.Lock()
 
+# Dedicated inference threads: CTranslate2 releases the GIL while decoding, so this many
+# chunks run in parallel without competing with request handlers for the shared threadpool
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+_executor = ThreadPoolExecutor(max_workers=WHISPER_WORKERS, thread_name_prefix="whisper")
+
+# Phrases Whisper tends to invent on silence/noise; segments matching exactly are dropped
+HALLUCINATION_BLACKLIST = frozenset({
+    "you",
+    "thank you",
+    "thanks",
+    "watching",
+    "subscribe",
+    "subtitle by",
+    ".",
+    ""
+})
+BLACKLIST_MAX_LEN = max(map(len, HALLUCINATION_BLACKLIST))
+MIN_AVG_LOGPROB = -1.0
+
+# Chunks whose RMS level is below -40 dBFS (ambient room noise) skip Whisper entirely
+SILENCE_RMS = 10 ** (-40 / 20)
+
+# Silero VAD tuned for speech-only audio: consultations have long listening pauses, and
+# every frame VAD drops is decoder work Whisper never does
+VAD_PARAMETERS = {
+    "threshold": 0.5,
+    "min_speech_duration_ms": 250,   # ignore clicks and breaths
+    "min_silence_duration_ms": 500,
+    "speech_pad_ms": 200             # tighter than the 400 ms default
+}
+
+# tiny.en with int8 weights is ~2x faster than base on CPU for English consultations
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny.en")
+
+def _resolve_device(requested: str) -> str:
+    """'auto' picks CUDA when CTranslate2 (bundled with faster-whisper) sees a GPU"""
+    if requested != "auto":
+        return requested
+    try:
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+# WHISPER_DEVICE=auto|cpu|cuda; CUDA runs inference with int8 weights / fp16 activations
+WHISPER_DEVICE = _resolve_device(os.getenv("WHISPER_DEVICE", "auto"))
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE") or ("int8_float16" if WHISPER_DEVICE == "cuda" else "int8")
+
+def _physical_cores() -> int:
+    """Physical core count when psutil is installed, else the logical count"""
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+# One CTranslate2 replica per executor thread so concurrent chunks decode in parallel;
+# the physical cores are split between them (SMT siblings don't speed up matmul)
+WHISPER_NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", str(WHISPER_WORKERS)))
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0")) or max(1, _physical_cores() // WHISPER_NUM_WORKERS)
+
 def get_model():
     """
     Lazy-load and cache the Faster Whisper model (thread-safe).
-    Optimized for CPU-only, low-RAM environments.
+    Optimized for CPU-only, low-RAM environments unless a GPU is in use.
     """
     global _model
     
     if not WHISPER_AVAILABLE:
-        print("[Warning] faster-whisper not installed. Transcription disabled.")
+        logger.warning("faster-whisper not installed. Transcription disabled.")
         return None
 
     if _model is None:
         with _model_lock:
             if _model is None:  # Double-check locking
-                print("Loading Faster Whisper Model (tiny.en | CPU | int8)...")
+                logger.info("Loading Faster Whisper Model (%s | %s | %s)...", WHISPER_MODEL, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE)
                 try:
                     _model = WhisperModel(
-                        "base",
-                        device="cpu",
-                        compute_type="int8",
-                        cpu_threads=max(1, os.cpu_count() // 2),
-                        num_workers=1
+                        WHISPER_MODEL,
+                        device=WHISPER_DEVICE,
+                        compute_type=WHISPER_COMPUTE_TYPE,
+                        cpu_threads=WHISPER_CPU_THREADS,
+                        num_workers=WHISPER_NUM_WORKERS
                     )
-                    print("Model loaded successfully.")
+                    logger.info("Model loaded successfully.")
                 except Exception as e:
-                    print(f"[WhisperModel Error] {e}")
+                    logger.error("WhisperModel error: %s", e)
                     return None
     return _model
 
 
-def transcribe_audio_chunk(file_path: str) -> str:
+def warmup():
     """
-    Transcribe an audio chunk with aggressive silence removal
-    and hallucination filtering.
+    Load the model and run it once on half a second of silence so CTranslate2
+    initializes its kernels before the first real chunk arrives.
     """
     model = get_model()
     if model is None:
-        return ""
+        return
+    try:
+        segments, _ = model.transcribe(np.zeros(8000, dtype=np.float32), language="en", beam_size=1)
+        list(segments)  # segments are lazy; decoding only happens when consumed
+        logger.info("Whisper warmup complete.")
+    except Exception as e:
+        logger.warning("Whisper warmup failed: %s", e)
 
-    if not os.path.exists(file_path):
-        return ""
+
+def iter_transcript(audio: Union[str, BinaryIO]) -> Iterator[str]:
+    """
+    Yield the text of each kept segment as soon as Whisper decodes it, with
+    aggressive silence removal and hallucination filtering.
+    """
+    model = get_model()
+    if model is None:
+        return
 
     try:
+        # Decode once here (the model accepts the samples directly) so silent chunks are
+        # dropped before the mel spectrogram and encoder run at all
+        samples = decode_audio(audio)
+        # Mean power from one dot product, without allocating a squared copy of the samples
+        if samples.size == 0 or samples.dot(samples) / samples.size < SILENCE_RMS ** 2:
+            return
+
         segments, info = model.transcribe(
-            file_path,
+            samples,
             language="en",
             beam_size=1,                         # Fast greedy decoding
             vad_filter=True,                     # Skip silence
-            vad_parameters={
-                "min_silence_duration_ms": 500
-            },
+            vad_parameters=VAD_PARAMETERS,
             condition_on_previous_text=False,
-            temperature=0.0                     # Reduces hallucinations
+            without_timestamps=True,             # Only text/avg_logprob are used; skip timestamp tokens
+            # Hard greedy, no fallback ladder: a low-confidence chunk is never re-decoded at a
+            # higher temperature, it is dropped by the avg_logprob filter below. Deliberate
+            # quality-for-latency trade for short live chunks.
+            temperature=[0.0],
+            compression_ratio_threshold=None,    # no zlib retry check per segment
+            # Kept (not -inf) because Whisper also uses it to skip no-speech segments
+            log_prob_threshold=MIN_AVG_LOGPROB
         )
 
-        results = []
-
+        # segments is lazy: each iteration decodes the next VAD-kept span
         for segment in segments:
-            text = segment.text.strip()
-
-            # Confidence filter
-            if segment.avg_logprob < -1.0:
+            # Confidence filter, before touching the text at all
+            if segment.avg_logprob < MIN_AVG_LOGPROB:
                 continue
 
+            text = segment.text.strip()
+
             # Length filter
             if len(text) < 2:
                 continue
 
-            # Hallucination blacklist
-            blacklist = {
-                "you",
-                "thank you",
-                "thanks",
-                "watching",
-                "subscribe",
-                "subtitle by",
-                ".",
-                ""
-            }
-
-            if text.lower() in blacklist:
+            # Hallucination blacklist; longer text can't match, so skip lowercasing it
+            if len(text) <= BLACKLIST_MAX_LEN and text.lower() in HALLUCINATION_BLACKLIST:
                 continue
 
-            results.append(text)
-
-        return " ".join(results)
+            yield text
 
     except Exception as e:
-        print(f"[Transcription Error] {e}")
-        return ""
+        logger.error("Transcription error: %s", e)
+
 
+def transcribe_audio(audio: Union[str, BinaryIO]) -> str:
+    """
+    Transcribe an audio file path or in-memory buffer into a single string.
+    """
+    return " ".join(iter_transcript(audio))
+
+
+async def transcribe_audio_async(audio: Union[str, BinaryIO]) -> str:
+    """transcribe_audio on the Whisper executor, keeping the event loop free"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, transcribe_audio, audio)
+
+
+async def aiter_transcript(audio: Union[str, BinaryIO]) -> AsyncIterator[str]:
+    """iter_transcript with each segment decoded on the Whisper executor"""
+    loop = asyncio.get_running_loop()
+    segments = iter_transcript(audio)
+    try:
+        while (text := await loop.run_in_executor(_executor, next, segments, None)) is not None:
+            yield text
     finally:
-        # Always clean up temp files
-        try:
-            os.remove(file_path)
-        except Exception:
-            pass
+        # Release the decoder when the consumer stops early (error, closed socket)
+        segments.close()
@@ -0,0 +1,65 @@
+"""
+Shared fixtures: one in-memory database for the whole test session, with every
+test isolated in a transaction that is rolled back afterwards
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.main import app
+from app.cache import doctor_dashboards
+from app.database import get_db
+
+
+@pytest.fixture(name="engine", scope="session")
+def engine_fixture():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    # pysqlite manages BEGIN itself and breaks SAVEPOINTs; let SQLAlchemy emit it instead
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(name="session")
+def session_fixture(engine):
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # Commits made by fixtures and routes only release a SAVEPOINT inside this transaction
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+            yield session
+        transaction.rollback()
+
+
+@pytest.fixture(scope="session")
+def _test_client():
+    return TestClient(app=app, follow_redirects=False)
+
+
+@pytest.fixture(name="client")
+def client_fixture(_test_client: TestClient, session: Session):
+    def get_session_override():
+        return session
+
+    app.dependency_overrides[get_db] = get_session_override
+    yield _test_client
+    app.dependency_overrides.clear()
+    _test_client.cookies.clear()
+    doctor_dashboards.clear()
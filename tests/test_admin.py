@@ -0,0 +1,195 @@
+"""
+Test cases for admin functionality (staff management, audit logs)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.models import User, UserRole, DoctorStatus, PrivacyLog, Consultation, ConsultationStatus, Specialty
+from app.security import pwd_context, create_access_token
+
+# Hashed once at import; fixtures re-create the same users for every test
+ADMIN_PASSWORD_HASH = pwd_context.hash("admin123")
+DOCTOR_PASSWORD_HASH = pwd_context.hash("doctor123")
+
+
+@pytest.fixture(name="test_admin")
+def test_admin_fixture(session: Session):
+    admin = User(
+        email="admin@example.com",
+        hashed_password=ADMIN_PASSWORD_HASH,
+        full_name="Test Admin",
+        role=UserRole.ADMIN
+    )
+    session.add(admin)
+    session.commit()
+    session.refresh(admin)
+    return admin
+
+
+@pytest.fixture(name="test_doctor")
+def test_doctor_fixture(session: Session):
+    doctor = User(
+        email="doctor@example.com",
+        hashed_password=DOCTOR_PASSWORD_HASH,
+        full_name="Dr. Test",
+        role=UserRole.DOCTOR,
+        specialty=Specialty.GENERAL,
+        status=DoctorStatus.ONLINE
+    )
+    session.add(doctor)
+    session.commit()
+    session.refresh(doctor)
+    return doctor
+
+
+@pytest.fixture(name="authenticated_admin_client")
+def authenticated_admin_client_fixture(client: TestClient, test_admin: User):
+    """Create authenticated client for admin"""
+    token = create_access_token(data={"sub": test_admin.email})
+    client.cookies.set("access_token", f"Bearer {token}")
+    return client
+
+
+def _add_logs(session: Session, actor: User, count: int):
+    logs = [
+        PrivacyLog(
+            actor_id=actor.id,
+            actor_name=actor.full_name,
+            action=f"Action {i}",
+            target_data="System Internal",
+            purpose="Testing"
+        )
+        for i in range(count)
+    ]
+    session.add_all(logs)
+    session.commit()
+    for log in logs:
+        session.refresh(log)
+    return logs
+
+
+class TestAdminAccess:
+    """Test the admin-only access guard"""
+
+    def test_admin_route_without_token(self, client: TestClient):
+        """Test that anonymous requests are rejected"""
+        response = client.post(
+            "/admin/delete_logs",
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 401
+        assert "error" in response.json()
+
+    def test_admin_route_without_token_redirects(self, client: TestClient):
+        """Test that anonymous browser requests go back to login"""
+        response = client.post("/admin/delete_logs")
+        assert response.status_code == 303
+        assert response.headers["location"] == "/"
+
+    def test_admin_route_as_doctor(self, client: TestClient, test_doctor: User):
+        """Test that non-admin users are forbidden"""
+        token = create_access_token(data={"sub": test_doctor.email})
+        client.cookies.set("access_token", f"Bearer {token}")
+        response = client.post(
+            "/admin/remove_doctor",
+            data={"doctor_id": test_doctor.id},
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 403
+        assert "error" in response.json()
+
+
+class TestRemoveDoctor:
+    """Test doctor removal"""
+
+    def test_remove_doctor_success(
+        self, authenticated_admin_client: TestClient, test_doctor: User, session: Session
+    ):
+        """Test removing a doctor without open consultations"""
+        doctor_id = test_doctor.id
+        response = authenticated_admin_client.post(
+            "/admin/remove_doctor",
+            data={"doctor_id": doctor_id},
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 200
+        assert response.json()["success"] == True
+        session.expire_all()
+        assert session.get(User, doctor_id) is None
+
+    def test_remove_doctor_with_active_consultations(
+        self, authenticated_admin_client: TestClient, test_doctor: User, session: Session
+    ):
+        """Test that doctors with open consultations cannot be removed"""
+        for status in (ConsultationStatus.ACTIVE, ConsultationStatus.PENDING_PAYMENT, ConsultationStatus.COMPLETED):
+            session.add(Consultation(
+                patient_id=test_doctor.id,
+                doctor_id=test_doctor.id,
+                specialty=Specialty.GENERAL,
+                status=status,
+                symptoms_enc=""
+            ))
+        session.commit()
+
+        response = authenticated_admin_client.post(
+            "/admin/remove_doctor",
+            data={"doctor_id": test_doctor.id},
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 400
+        assert "2 active consultation(s)" in response.json()["error"]
+
+
+class TestDeleteLogs:
+    """Test privacy log deletion"""
+
+    def test_delete_selected_logs(
+        self, authenticated_admin_client: TestClient, test_admin: User, session: Session
+    ):
+        """Test deleting specific logs, ignoring unknown IDs"""
+        logs = _add_logs(session, test_admin, 3)
+        response = authenticated_admin_client.post(
+            "/admin/delete_logs",
+            data={"log_ids": f"{logs[0].id}, {logs[1].id}, 9999, abc"},
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 200
+        assert "deleted 2 log(s)" in response.json()["message"]
+
+        remaining = session.exec(select(PrivacyLog.action)).all()
+        assert "Action 2" in remaining
+        assert "Action 0" not in remaining
+
+    def test_delete_all_logs(
+        self, authenticated_admin_client: TestClient, test_admin: User, session: Session
+    ):
+        """Test clearing every log"""
+        _add_logs(session, test_admin, 3)
+        response = authenticated_admin_client.post(
+            "/admin/delete_logs",
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 200
+        assert "deleted 3 log(s)" in response.json()["message"]
+
+        # Only the audit entry for the deletion itself remains
+        remaining = session.exec(select(PrivacyLog)).all()
+        assert len(remaining) == 1
+        assert remaining[0].action == "Deleted Privacy Logs"
+
+
+class TestAdminDashboard:
+    """Test admin dashboard rendering"""
+
+    def test_dashboard_escapes_user_fields(
+        self, authenticated_admin_client: TestClient, test_doctor: User, session: Session
+    ):
+        """Test that templates escape string fields by default, without a per-field |e"""
+        test_doctor.full_name = "<script>alert(1)</script>"
+        session.add(test_doctor)
+        session.commit()
+        response = authenticated_admin_client.get("/dashboard")
+        assert response.status_code == 200
+        assert "<script>alert(1)</script>" not in response.text
+        assert "&lt;script&gt;alert(1)&lt;/script&gt;" in response.text
@@ -3,47 +3,20 @@ Test cases for authentication functionality
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel import Session
 
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.main import app
-from app.database import get_db
 from app.models import User, UserRole, DoctorStatus
-from app.security import pwd_context
+from app.security import PBKDF2_ROUNDS, hash_password, pwd_context
 
-
-# Test database setup
-@pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
-        yield session
-
-
-@pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
-
-    app.dependency_overrides[get_db] = get_session_override
-    client = TestClient(app=app, follow_redirects=False)
-    yield client
-    app.dependency_overrides.clear()
+# Hashed once at import; fixtures re-create the same users for every test
+TEST_USER_PASSWORD_HASH = pwd_context.hash("testpassword123")
 
 
 @pytest.fixture(name="test_user")
 def test_user_fixture(session: Session):
     user = User(
         email="test@example.com",
-        hashed_password=pwd_context.hash("testpassword123"),
+        hashed_password=TEST_USER_PASSWORD_HASH,
         full_name="Test User",
         role=UserRole.PATIENT
     )
@@ -65,6 +38,30 @@ class TestLogin:
         assert response.status_code == 303
         assert "access_token" in response.cookies
     
+    def test_login_upgrades_legacy_hash(self, client: TestClient, session: Session, test_user: User):
+        """Test that a passlib hash is rewritten in the hashlib format on login"""
+        response = client.post(
+            "/auth/login",
+            data={"username": "test@example.com", "password": "testpassword123"}
+        )
+        assert response.status_code == 303
+        session.refresh(test_user)
+        assert test_user.hashed_password.startswith("pbkdf2_sha256$")
+
+    def test_login_upgrades_low_round_hash(self, client: TestClient, session: Session, test_user: User):
+        """Test that a hash below PBKDF2_ROUNDS (e.g. the 1000-round demo seed) is rehashed on login"""
+        test_user.hashed_password = hash_password("testpassword123", rounds=1000)
+        session.add(test_user)
+        session.commit()
+
+        response = client.post(
+            "/auth/login",
+            data={"username": "test@example.com", "password": "testpassword123"}
+        )
+        assert response.status_code == 303
+        session.refresh(test_user)
+        assert test_user.hashed_password.startswith(f"pbkdf2_sha256${PBKDF2_ROUNDS}$")
+    
     def test_login_invalid_email(self, client: TestClient, test_user: User):
         """Test login with invalid email"""
         response = client.post(
@@ -175,6 +172,22 @@ class TestRegistration:
         assert response.status_code == 400
 
 
+class TestSeed:
+    """Test demo data seeding"""
+    
+    def test_seed_users_can_login(self, client: TestClient):
+        """Test that seeded demo accounts authenticate with their demo passwords"""
+        response = client.post("/auth/seed")
+        assert response.status_code == 303
+        
+        response = client.post(
+            "/auth/login",
+            data={"username": "admin@hospital.com", "password": "admin123"}
+        )
+        assert response.status_code == 303
+        assert "access_token" in response.cookies
+
+
 class TestLogout:
     """Test logout functionality"""
     
@@ -5,7 +5,9 @@ import pytest
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.security import encrypt_phi, decrypt_phi, create_access_token
+from fastapi import HTTPException
+from app.security import encrypt_phi, decrypt_phi, create_access_token, cipher_suite, get_current_user_from_token, _decode_token
+from app.security import hash_password, verify_password, password_needs_rehash, pwd_context
 from jose import jwt
 from app.config import settings
 
@@ -44,33 +46,105 @@ class TestEncryption:
         encrypted = encrypt_phi(text)
         decrypted = decrypt_phi(encrypted)
         assert decrypted == text
+    
+    def test_decrypt_legacy_fernet_token(self):
+        """Test that PHI written with Fernet before AES-GCM still decrypts"""
+        token = cipher_suite.encrypt("Legacy symptoms".encode()).decode()
+        assert decrypt_phi(token) == "Legacy symptoms"
+    
+    def test_decrypt_tampered_data(self):
+        """Test that a modified AES-GCM token fails authentication"""
+        encrypted = encrypt_phi("Patient has headache")
+        tampered = encrypted[:-4] + ("AAAA" if not encrypted.endswith("AAAA") else "BBBB")
+        assert decrypt_phi(tampered) == ""
+
+
+class TestPasswordHashing:
+    """Test PBKDF2 password hashing"""
+    
+    def test_hash_and_verify(self):
+        """Test that a hashed password verifies and a wrong one does not"""
+        stored = hash_password("s3cret")
+        assert verify_password("s3cret", stored)
+        assert not verify_password("wrong", stored)
+        assert not password_needs_rehash(stored)
+    
+    def test_verify_legacy_passlib_hash(self):
+        """Test that hashes written by passlib still verify and are flagged for migration"""
+        stored = pwd_context.hash("s3cret")
+        assert verify_password("s3cret", stored)
+        assert password_needs_rehash(stored)
+
+    def test_low_round_hash_needs_rehash(self):
+        """Test that hashes below PBKDF2_ROUNDS still verify and are flagged for an upgrade"""
+        stored = hash_password("s3cret", rounds=1000)
+        assert verify_password("s3cret", stored)
+        assert password_needs_rehash(stored)
+
+
+@pytest.fixture(scope="module")
+def access_token():
+    """One signed token shared by the read-only token tests"""
+    return create_access_token({"sub": "test@example.com"})
+
+
+@pytest.fixture(scope="module")
+def token_payload(access_token):
+    return jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
 
 
 class TestTokenGeneration:
     """Test JWT token generation"""
     
-    def test_create_access_token(self):
+    def test_create_access_token(self, access_token):
         """Test creating access token"""
-        data = {"sub": "test@example.com"}
-        token = create_access_token(data)
-        assert token is not None
-        assert len(token) > 0
+        assert access_token
     
-    def test_token_contains_expiry(self):
+    def test_token_contains_expiry(self, token_payload):
         """Test that token contains expiry information"""
-        data = {"sub": "test@example.com"}
-        token = create_access_token(data)
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        assert "exp" in payload
-        assert "sub" in payload
-        assert payload["sub"] == "test@example.com"
+        assert "exp" in token_payload
+        assert token_payload["sub"] == "test@example.com"
     
-    def test_token_expiry_time(self):
+    def test_token_expiry_time(self, token_payload):
         """Test token expiry time"""
-        data = {"sub": "test@example.com"}
-        token = create_access_token(data)
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        exp_time = payload["exp"]
         # Token should expire in approximately ACCESS_TOKEN_EXPIRE_MINUTES
-        assert exp_time > 0
+        assert token_payload["exp"] > 0
+    
+    def test_cached_token_still_expires(self, monkeypatch):
+        """Test that a token whose payload is cached is rejected once it expires"""
+        token = create_access_token({"sub": "test@example.com"})
+        payload = _decode_token(token)  # primes the cache
+        monkeypatch.setattr("app.security.time.time", lambda: payload["exp"] + 1)
+        with pytest.raises(HTTPException) as exc_info:
+            get_current_user_from_token(token, session=None)
+        assert exc_info.value.detail == "Invalid or expired token"
+
+
+class TestKeyRotation:
+    """Test re-encrypting stored PHI under a new ENCRYPTION_KEY"""
+
+    def test_reencrypt_phi(self, session):
+        """Test that values sealed with the old key are rewritten for the current key"""
+        from cryptography.fernet import Fernet
+        from app.key_rotation import reencrypt_phi
+        from app.models import Consultation, ConsultationStatus, User, UserRole
+
+        old_key = Fernet.generate_key()
+        user = User(email="rotate@example.com", hashed_password="x", full_name="Rotate", role=UserRole.PATIENT)
+        session.add(user)
+        session.commit()
+        consult = Consultation(
+            patient_id=user.id,
+            doctor_id=user.id,
+            specialty="General",
+            status=ConsultationStatus.COMPLETED,
+            symptoms_enc=Fernet(old_key).encrypt(b"Headache").decode(),
+            notes_enc=encrypt_phi("Already current")
+        )
+        session.add(consult)
+        session.commit()
 
+        assert reencrypt_phi(session, old_key) == 1
+        session.refresh(consult)
+        assert decrypt_phi(consult.symptoms_enc) == "Headache"
+        assert decrypt_phi(consult.notes_enc) == "Already current"
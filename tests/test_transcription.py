@@ -0,0 +1,118 @@
+"""
+Test cases for the Whisper transcription pipeline, with the model and audio decoder stubbed
+"""
+import io
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import pytest
+
+from app import transcription
+
+
+class FakeSamples(list):
+    """The two ndarray members iter_transcript uses on decoded audio"""
+
+    @property
+    def size(self):
+        return len(self)
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+
+class FakeModel:
+    """Yields the given (text, avg_logprob) segments lazily, like faster-whisper"""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.calls = 0
+        self.closed = False
+
+    def _generate(self):
+        try:
+            for text, avg_logprob in self.segments:
+                yield SimpleNamespace(text=text, avg_logprob=avg_logprob)
+        finally:
+            self.closed = True
+
+    def transcribe(self, samples, **options):
+        self.calls += 1
+        return self._generate(), None
+
+
+LOUD = FakeSamples([0.5] * 160)
+SILENT = FakeSamples([0.001] * 160)
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    """Install a stub model and decoder; returns a function that sets the segments and samples"""
+    def install(segments, samples=LOUD):
+        model = FakeModel(segments)
+        monkeypatch.setattr(transcription, "get_model", lambda: model)
+        monkeypatch.setattr(transcription, "decode_audio", lambda audio: samples, raising=False)
+        return model
+    return install
+
+
+class TestIterTranscript:
+    """Test segment filtering in iter_transcript"""
+
+    def test_silent_buffer_skips_model(self, whisper):
+        """Test that audio below the silence threshold never reaches Whisper"""
+        model = whisper([(" Hello there", -0.2)], samples=SILENT)
+        assert list(transcription.iter_transcript(io.BytesIO(b"audio"))) == []
+        assert model.calls == 0
+
+    def test_empty_buffer_yields_nothing(self, whisper):
+        """Test that a chunk that decodes to no samples is skipped"""
+        model = whisper([(" Hello there", -0.2)], samples=FakeSamples())
+        assert list(transcription.iter_transcript(io.BytesIO(b""))) == []
+        assert model.calls == 0
+
+    def test_filters_low_confidence_and_blacklisted_segments(self, whisper):
+        """Test that low avg_logprob, too-short and hallucinated segments are dropped"""
+        whisper([
+            (" It hurts here.", -0.3),
+            (" Mumbled words", -1.5),
+            (" Thank you", -0.1),
+            (" .", -0.1),
+            (" I", -0.1),
+            (" Take rest.", -0.4),
+        ])
+        assert list(transcription.iter_transcript(io.BytesIO(b"audio"))) == ["It hurts here.", "Take rest."]
+
+    def test_transcribe_audio_joins_segments(self, whisper):
+        """Test that the one-shot helper joins the kept segments"""
+        whisper([(" It hurts here.", -0.3), (" Take rest.", -0.4)])
+        assert transcription.transcribe_audio(io.BytesIO(b"audio")) == "It hurts here. Take rest."
+
+    def test_no_model_yields_nothing(self, monkeypatch):
+        """Test that transcription is a no-op when faster-whisper is unavailable"""
+        monkeypatch.setattr(transcription, "get_model", lambda: None)
+        assert list(transcription.iter_transcript(io.BytesIO(b"audio"))) == []
+
+
+class TestAsyncTranscript:
+    """Test the executor-backed async helpers"""
+
+    async def test_aiter_transcript_yields_in_order(self, whisper):
+        """Test that segments stream out in decode order"""
+        whisper([(" One two.", -0.2), (" Three four.", -0.2), (" Five six.", -0.2)])
+        texts = [text async for text in transcription.aiter_transcript(io.BytesIO(b"audio"))]
+        assert texts == ["One two.", "Three four.", "Five six."]
+
+    async def test_aiter_transcript_closes_on_early_exit(self, whisper):
+        """Test that stopping after the first segment closes the decoder generator"""
+        model = whisper([(" One two.", -0.2), (" Three four.", -0.2)])
+        async with aclosing(transcription.aiter_transcript(io.BytesIO(b"audio"))) as segments:
+            async for text in segments:
+                assert text == "One two."
+                break
+        assert model.closed
+
+    async def test_transcribe_audio_async(self, whisper):
+        """Test that the async wrapper returns the joined transcript"""
+        whisper([(" It hurts here.", -0.3)])
+        assert await transcription.transcribe_audio_async(io.BytesIO(b"audio")) == "It hurts here."
@@ -1,48 +1,29 @@
 """
 Test cases for workflow functionality (triage, consultation, billing)
 """
+from datetime import datetime
+
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
-
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from app.main import app
-from app.database import get_db
-from app.models import User, Consultation, UserRole, DoctorStatus, ConsultationStatus
-from app.security import pwd_context, create_access_token
-
-
-@pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
-        yield session
-
+from sqlmodel import Session
 
-@pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
+from app.models import User, Consultation, UserRole, DoctorStatus, ConsultationStatus, PrivacyLog, TranscriptChunk, Specialty
+from app.security import pwd_context, create_access_token, encrypt_phi
 
-    app.dependency_overrides[get_db] = get_session_override
-    client = TestClient(app=app, follow_redirects=False)
-    yield client
-    app.dependency_overrides.clear()
+# Hashed once at import; fixtures re-create the same users for every test
+PATIENT_PASSWORD_HASH = pwd_context.hash("patient123")
+DOCTOR_PASSWORD_HASH = pwd_context.hash("doctor123")
+OTHER_USER_PASSWORD_HASH = pwd_context.hash("password")
+# Encrypted once for the consultations tests create; no test inspects the ciphertext itself
+ENC_HEADACHE = encrypt_phi("Headache")
 
 
 @pytest.fixture(name="test_patient")
 def test_patient_fixture(session: Session):
     patient = User(
         email="patient@example.com",
-        hashed_password=pwd_context.hash("patient123"),
+        hashed_password=PATIENT_PASSWORD_HASH,
         full_name="Test Patient",
         role=UserRole.PATIENT
     )
@@ -56,10 +37,10 @@ def test_patient_fixture(session: Session):
 def test_doctor_fixture(session: Session):
     doctor = User(
         email="doctor@example.com",
-        hashed_password=pwd_context.hash("doctor123"),
+        hashed_password=DOCTOR_PASSWORD_HASH,
         full_name="Dr. Test",
         role=UserRole.DOCTOR,
-        specialty="General",
+        specialty=Specialty.GENERAL,
         status=DoctorStatus.ONLINE
     )
     session.add(doctor)
@@ -94,7 +75,7 @@ class TestTriage:
         response = authenticated_patient_client.post(
             "/triage/start",
             data={
-                "specialty": "General",
+                "specialty": Specialty.GENERAL.value,
                 "symptoms": "Headache and fever"
             }
         )
@@ -121,20 +102,51 @@ class TestTriage:
         response = authenticated_patient_client.post(
             "/triage/start",
             data={
-                "specialty": "General",
+                "specialty": Specialty.GENERAL.value,
                 "symptoms": "Headache and fever"
             },
             headers={"Accept": "application/json"}
         )
         assert response.status_code == 404
         assert "error" in response.json()
-    
+
+    def test_start_triage_negotiates_mixed_accept(
+        self, authenticated_patient_client: TestClient, test_doctor: User, session: Session
+    ):
+        """Test that an Accept header listing JSON among other types still gets JSON"""
+        test_doctor.status = DoctorStatus.OFFLINE
+        session.add(test_doctor)
+        session.commit()
+
+        response = authenticated_patient_client.post(
+            "/triage/start",
+            data={
+                "specialty": Specialty.GENERAL.value,
+                "symptoms": "Headache and fever"
+            },
+            headers={"Accept": "application/json, text/plain, */*"}
+        )
+        assert response.status_code == 404
+        assert "error" in response.json()
+
+    def test_start_triage_unknown_specialty(self, authenticated_patient_client: TestClient):
+        """Test that a specialty outside the Specialty enum is rejected before lookup"""
+        response = authenticated_patient_client.post(
+            "/triage/start",
+            data={
+                "specialty": "Astrology",
+                "symptoms": "Headache and fever"
+            },
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 422
+
     def test_start_triage_unauthorized(self, client: TestClient):
         """Test triage without authentication"""
         response = client.post(
             "/triage/start",
             data={
-                "specialty": "General",
+                "specialty": Specialty.GENERAL.value,
                 "symptoms": "Headache and fever"
             }
         )
@@ -149,13 +161,12 @@ class TestBilling:
     ):
         """Test accessing billing page"""
         # Create a consultation
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.PENDING_PAYMENT,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -169,10 +180,9 @@ class TestBilling:
     ):
         """Test accessing billing page for another patient's consultation"""
         # Create a consultation with different patient
-        from app.security import encrypt_phi
         other_patient = User(
             email="other@example.com",
-            hashed_password=pwd_context.hash("password"),
+            hashed_password=OTHER_USER_PASSWORD_HASH,
             full_name="Other Patient",
             role=UserRole.PATIENT
         )
@@ -182,9 +192,9 @@ class TestBilling:
         consultation = Consultation(
             patient_id=other_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.PENDING_PAYMENT,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -197,13 +207,12 @@ class TestBilling:
         self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test successful payment processing"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.PENDING_PAYMENT,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -220,6 +229,7 @@ class TestBilling:
         
         session.refresh(consultation)
         assert consultation.status == ConsultationStatus.ACTIVE
+        assert isinstance(consultation.started_at, datetime)
 
 
 class TestConsultation:
@@ -229,13 +239,32 @@ class TestConsultation:
         self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test accessing consultation room"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.ACTIVE,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add(consultation)
+        session.commit()
+        session.refresh(consultation)
+        
+        response = authenticated_patient_client.get(f"/consultation/{consultation.id}")
+        assert response.status_code == 200
+        assert f'"userId": {test_patient.id}' in response.text
+        assert '"userRole": "patient"' in response.text
+    
+    def test_consultation_room_escapes_symptoms(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that decrypted PHI is HTML-escaped in the room"""
+        consultation = Consultation(
+            patient_id=test_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=encrypt_phi("<script>alert(1)</script>")
         )
         session.add(consultation)
         session.commit()
@@ -243,15 +272,16 @@ class TestConsultation:
         
         response = authenticated_patient_client.get(f"/consultation/{consultation.id}")
         assert response.status_code == 200
+        assert "&lt;script&gt;alert(1)&lt;/script&gt;" in response.text
+        assert "<script>alert(1)</script>" not in response.text
     
     def test_consultation_room_unauthorized(
         self, authenticated_patient_client: TestClient, test_doctor: User, session: Session
     ):
         """Test accessing consultation room without authorization"""
-        from app.security import encrypt_phi
         other_patient = User(
             email="other@example.com",
-            hashed_password=pwd_context.hash("password"),
+            hashed_password=OTHER_USER_PASSWORD_HASH,
             full_name="Other Patient",
             role=UserRole.PATIENT
         )
@@ -261,9 +291,9 @@ class TestConsultation:
         consultation = Consultation(
             patient_id=other_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -271,18 +301,45 @@ class TestConsultation:
         
         response = authenticated_patient_client.get(f"/consultation/{consultation.id}")
         assert response.status_code == 403
-    
+
+    def test_consultation_room_history(
+        self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that the doctor sees the patient's previous consultations"""
+        previous = Consultation(
+            patient_id=test_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.COMPLETED,
+            symptoms_enc=encrypt_phi("Persistent cough"),
+            notes_enc=encrypt_phi("Rest advised\r\n\r\nPrescriptions:\r\n1. Amoxicillin - 500mg, 3x daily\r\n")
+        )
+        consultation = Consultation(
+            patient_id=test_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.ACTIVE,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add_all([previous, consultation])
+        session.commit()
+        session.refresh(consultation)
+
+        response = authenticated_doctor_client.get(f"/consultation/{consultation.id}")
+        assert response.status_code == 200
+        assert "Persistent cough" in response.text
+        assert "Amoxicillin - 500mg, 3x daily" in response.text
+
     def test_save_notes(
         self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test saving consultation notes"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -304,13 +361,12 @@ class TestConsultation:
         self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test ending consultation"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         test_doctor.status = DoctorStatus.BUSY
@@ -323,9 +379,300 @@ class TestConsultation:
         
         session.refresh(consultation)
         assert consultation.status == ConsultationStatus.COMPLETED
+        assert isinstance(consultation.ended_at, datetime)
         
         session.refresh(test_doctor)
         assert test_doctor.status == DoctorStatus.ONLINE
+    
+    def test_end_consultation_folds_transcript(
+        self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that live transcript chunks are merged into the consultation record"""
+        from sqlmodel import select
+        from app.security import decrypt_phi
+        consultation = Consultation(
+            patient_id=test_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.ACTIVE,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add(consultation)
+        session.commit()
+        session.refresh(consultation)
+        session.add(TranscriptChunk(consultation_id=consultation.id, user_id=test_doctor.id, seq=2, text_enc=encrypt_phi("Take rest.")))
+        session.add(TranscriptChunk(consultation_id=consultation.id, user_id=test_patient.id, seq=1, text_enc=encrypt_phi("It hurts here.")))
+        session.commit()
+        
+        response = authenticated_doctor_client.get(f"/consultation/end/{consultation.id}")
+        assert response.status_code == 303
+        
+        session.refresh(consultation)
+        assert decrypt_phi(consultation.transcript_enc) == "Test Patient: It hurts here.\nDr. Test: Take rest."
+        assert session.exec(select(TranscriptChunk)).all() == []
+
+    def test_transcript_chunk_dropped_after_end(
+        self, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that chunks arriving after the consultation ended are not stored"""
+        from sqlmodel import select
+        from app.routers.workflow import _append_transcript_chunk
+        consultation = Consultation(
+            patient_id=test_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.COMPLETED,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add(consultation)
+        session.commit()
+        session.refresh(consultation)
+
+        assert not _append_transcript_chunk(session, consultation.id, test_patient.id, 1, "Late words")
+        assert session.exec(select(TranscriptChunk)).all() == []
+
+    def test_transcribe_requires_login(self, client: TestClient):
+        """Test that the transcription upload rejects anonymous clients"""
+        response = client.post(
+            "/consultation/transcribe",
+            data={"consultation_id": 1},
+            files={"audio_blob": ("chunk.webm", b"\x00", "audio/webm")},
+            headers={"Accept": "application/json"}
+        )
+        assert response.status_code == 401
+
+    def test_transcribe_rejects_non_participant(
+        self, authenticated_patient_client: TestClient, test_doctor: User, session: Session
+    ):
+        """Test that only participants can add to a consultation's transcript"""
+        other_patient = User(
+            email="other@example.com",
+            hashed_password=OTHER_USER_PASSWORD_HASH,
+            full_name="Other Patient",
+            role=UserRole.PATIENT
+        )
+        session.add(other_patient)
+        session.commit()
+        consultation = Consultation(
+            patient_id=other_patient.id,
+            doctor_id=test_doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.ACTIVE,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add(consultation)
+        session.commit()
+        session.refresh(consultation)
+
+        response = authenticated_patient_client.post(
+            "/consultation/transcribe",
+            data={"consultation_id": consultation.id},
+            files={"audio_blob": ("chunk.webm", b"\x00", "audio/webm")}
+        )
+        assert response.status_code == 403
+
+
+class TestWebSocket:
+    """Test the consultation room WebSocket"""
+
+    def _active_consultation(self, session: Session, patient: User, doctor: User) -> Consultation:
+        consultation = Consultation(
+            patient_id=patient.id,
+            doctor_id=doctor.id,
+            specialty=Specialty.GENERAL,
+            status=ConsultationStatus.ACTIVE,
+            symptoms_enc=ENC_HEADACHE
+        )
+        session.add(consultation)
+        session.commit()
+        session.refresh(consultation)
+        return consultation
+
+    def test_participant_can_connect(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that a participant's socket is accepted and receives room messages"""
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+        with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}") as websocket:
+            websocket.send_text("hello")
+            assert websocket.receive_json()["text"] == "hello"
+
+    def test_audio_frame_is_transcribed_and_stored(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User,
+        session: Session, monkeypatch
+    ):
+        """Test that a binary frame is transcribed, broadcast and stored as a chunk"""
+        import threading
+        from sqlmodel import select
+        from app.routers import workflow
+
+        frames = []
+        stored = threading.Event()
+
+        async def fake_aiter_transcript(audio):
+            frames.append(audio.read())
+            yield "It hurts here."
+
+        def store_in_test_session(consult_id, user_id, seq, text):
+            workflow._append_transcript_chunk(session, consult_id, user_id, seq, text)
+            stored.set()
+
+        monkeypatch.setattr(workflow, "aiter_transcript", fake_aiter_transcript)
+        monkeypatch.setattr(workflow, "_store_transcript_chunk", store_in_test_session)
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+
+        with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}") as websocket:
+            websocket.send_bytes(b"segment")
+            message = websocket.receive_json()
+            assert stored.wait(5)
+
+        assert frames == [b"segment"]
+        assert message["type"] == "transcript"
+        assert message["user_id"] == test_patient.id
+        assert message["text"] == "It hurts here."
+        chunk = session.exec(select(TranscriptChunk)).one()
+        assert (chunk.consultation_id, chunk.user_id) == (consultation.id, test_patient.id)
+
+    def test_audio_frames_dropped_while_one_is_pending(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User,
+        session: Session, monkeypatch
+    ):
+        """Test that a socket has at most one transcription in flight"""
+        import asyncio
+        import threading
+        from app.routers import workflow
+
+        calls = []
+        release = threading.Event()
+
+        async def slow_aiter_transcript(audio):
+            calls.append(audio.read())
+            await asyncio.to_thread(release.wait, 5)
+            yield "done"
+
+        monkeypatch.setattr(workflow, "aiter_transcript", slow_aiter_transcript)
+        monkeypatch.setattr(workflow, "_store_transcript_chunk", lambda *args: True)
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+
+        with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}") as websocket:
+            websocket.send_bytes(b"first")
+            websocket.send_bytes(b"second")
+            # Frames are handled in order, so once the chat echo arrives "second" was seen
+            websocket.send_text("ping")
+            assert websocket.receive_json()["text"] == "ping"
+            release.set()
+            assert websocket.receive_json()["text"] == "done"
+
+        assert calls == [b"first"]
+
+    def test_oversized_audio_frame_closes_socket(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User,
+        session: Session, monkeypatch
+    ):
+        """Test that a frame above MAX_AUDIO_FRAME_BYTES is refused without transcribing it"""
+        from app.routers import workflow
+
+        calls = []
+
+        async def fake_aiter_transcript(audio):
+            calls.append(audio)
+            yield "never"
+
+        monkeypatch.setattr(workflow, "aiter_transcript", fake_aiter_transcript)
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+
+        with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}") as websocket:
+            websocket.send_bytes(b"\x00" * (workflow.MAX_AUDIO_FRAME_BYTES + 1))
+            with pytest.raises(WebSocketDisconnect) as excinfo:
+                websocket.receive_json()
+        assert excinfo.value.code == 1009
+        assert calls == []
+
+    def test_anonymous_socket_rejected(
+        self, client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that a socket without a session cookie is refused"""
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}"):
+                pass
+
+    def test_socket_user_id_must_match_login(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that a participant cannot join under the other participant's id"""
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+        with pytest.raises(WebSocketDisconnect):
+            with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_doctor.id}"):
+                pass
+
+    def test_socket_rejected_after_end(
+        self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
+    ):
+        """Test that an ended consultation no longer accepts sockets"""
+        consultation = self._active_consultation(session, test_patient, test_doctor)
+        consultation.status = ConsultationStatus.COMPLETED
+        session.add(consultation)
+        session.commit()
+        with pytest.raises(WebSocketDisconnect):
+            with authenticated_patient_client.websocket_connect(f"/ws/{consultation.id}/{test_patient.id}"):
+                pass
+
+
+class TestPatientDashboard:
+    """Test the patient dashboard"""
+
+    def test_dashboard_view_is_audited(
+        self, authenticated_patient_client: TestClient, test_patient: User, session: Session
+    ):
+        """Test that viewing the dashboard records a privacy log entry"""
+        response = authenticated_patient_client.get("/dashboard")
+        assert response.status_code == 200
+
+        from sqlmodel import select
+        log = session.exec(select(PrivacyLog).where(PrivacyLog.actor_id == test_patient.id)).first()
+        assert log is not None
+        assert log.action == "Viewed Dashboard"
+
+
+class TestDoctorDashboard:
+    """Test the cached doctor dashboard"""
+
+    def test_dashboard_refreshes_after_status_toggle(
+        self, authenticated_doctor_client: TestClient, test_doctor: User
+    ):
+        """Test that toggling status invalidates the cached dashboard"""
+        response = authenticated_doctor_client.get("/dashboard")
+        assert response.status_code == 200
+        assert "ONLINE" in response.text
+
+        response = authenticated_doctor_client.get("/doctor/toggle_status")
+        assert response.status_code == 307
+
+        response = authenticated_doctor_client.get("/dashboard")
+        assert "OFFLINE" in response.text
+
+    def test_render_racing_invalidate_is_not_cached(
+        self, authenticated_doctor_client: TestClient, test_doctor: User, monkeypatch
+    ):
+        """Test that a page rendered across an invalidate() is served but not cached"""
+        from app.cache import doctor_dashboards
+        from app.routers import workflow
+
+        render = workflow.render_template
+
+        def render_during_write(name, context):
+            doctor_dashboards.invalidate(test_doctor.id)
+            return render(name, context)
+
+        monkeypatch.setattr(workflow, "render_template", render_during_write)
+        response = authenticated_doctor_client.get("/dashboard")
+        assert response.status_code == 200
+        assert doctor_dashboards.get(test_doctor.id) is None
+
+        monkeypatch.setattr(workflow, "render_template", render)
+        authenticated_doctor_client.get("/dashboard")
+        assert doctor_dashboards.get(test_doctor.id) is not None
 
 
 class TestTransfer:
@@ -335,13 +682,12 @@ class TestTransfer:
         self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test getting available doctors for transfer"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -350,10 +696,10 @@ class TestTransfer:
         # Create another online doctor
         other_doctor = User(
             email="otherdoctor@example.com",
-            hashed_password=pwd_context.hash("password"),
+            hashed_password=OTHER_USER_PASSWORD_HASH,
             full_name="Dr. Other",
             role=UserRole.DOCTOR,
-            specialty="Cardiology",
+            specialty=Specialty.CARDIOLOGY,
             status=DoctorStatus.ONLINE
         )
         session.add(other_doctor)
@@ -369,13 +715,12 @@ class TestTransfer:
         self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test transferring consultation to another doctor"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         test_doctor.status = DoctorStatus.BUSY
@@ -386,10 +731,10 @@ class TestTransfer:
         # Create another online doctor
         new_doctor = User(
             email="newdoctor@example.com",
-            hashed_password=pwd_context.hash("password"),
+            hashed_password=OTHER_USER_PASSWORD_HASH,
             full_name="Dr. New",
             role=UserRole.DOCTOR,
-            specialty="Cardiology",
+            specialty=Specialty.CARDIOLOGY,
             status=DoctorStatus.ONLINE
         )
         session.add(new_doctor)
@@ -414,6 +759,7 @@ class TestTransfer:
         
         session.refresh(consultation)
         assert consultation.doctor_id == new_doctor.id
+        assert isinstance(consultation.updated_at, datetime)
         
         session.refresh(test_doctor)
         assert test_doctor.status == DoctorStatus.ONLINE
@@ -425,13 +771,12 @@ class TestTransfer:
         self, authenticated_patient_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test that patients cannot transfer consultations"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         session.commit()
@@ -444,13 +789,12 @@ class TestTransfer:
         self, authenticated_doctor_client: TestClient, test_patient: User, test_doctor: User, session: Session
     ):
         """Test transferring to an unavailable doctor"""
-        from app.security import encrypt_phi
         consultation = Consultation(
             patient_id=test_patient.id,
             doctor_id=test_doctor.id,
-            specialty="General",
+            specialty=Specialty.GENERAL,
             status=ConsultationStatus.ACTIVE,
-            symptoms_enc=encrypt_phi("Headache")
+            symptoms_enc=ENC_HEADACHE
         )
         session.add(consultation)
         test_doctor.status = DoctorStatus.BUSY
@@ -461,10 +805,10 @@ class TestTransfer:
         # Create an offline doctor
         offline_doctor = User(
             email="offlinedoctor@example.com",
-            hashed_password=pwd_context.hash("password"),
+            hashed_password=OTHER_USER_PASSWORD_HASH,
             full_name="Dr. Offline",
             role=UserRole.DOCTOR,
-            specialty="Cardiology",
+            specialty=Specialty.CARDIOLOGY,
             status=DoctorStatus.OFFLINE
         )
         session.add(offline_doctor)